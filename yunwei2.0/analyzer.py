@@ -1,7 +1,6 @@
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 import logging
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from config import Config
 from states import OpsAssistantState, MetricValue, SystemAlert, AlertLevel
@@ -12,10 +11,17 @@ class SystemAnalyzer:
     """系统智能分析器"""
 
     def __init__(self):
-        llm_config = Config.get_llm_config()
-        self.llm = ChatOpenAI(**llm_config)
+        self._llm = None
         self.system_prompt = self._build_system_prompt()
 
+    @property
+    def llm(self):
+        """LLM客户端，首次使用时才导入并创建"""
+        if self._llm is None:
+            from langchain_openai import ChatOpenAI
+            self._llm = ChatOpenAI(**Config.get_llm_config())
+        return self._llm
+
     def _build_system_prompt(self) -> str:
         """构建系统提示词"""
         return """你是一个专业的Linux系统运维专家和智能运维助手。你的主要职责是：
@@ -26,6 +26,9 @@ class Config:
     MAX_RETRIES = 3
     TIMEOUT = 30
     LOG_LEVEL = "INFO"
+    METRICS_CACHE_TTL = 10  # 监控指标缓存时间(秒)
+    METRICS_PUSH_INTERVAL = 10  # WebSocket推送监控指标的间隔(秒)，与缓存时间一致
+    MAX_PARALLEL_COMMANDS = 8  # 修复方案同组并行执行的最大命令数
 
     # 监控指标阈值
     THRESHOLDS = {
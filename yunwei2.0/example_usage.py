@@ -8,10 +8,7 @@ import asyncio
 import logging
 from datetime import datetime
 
-from ops_graph import OpsAssistantGraph
-from monitoring import PrometheusClient
-from remote_executor import RemoteExecutor
-from analyzer import SystemAnalyzer
+# 各示例所需的模块在函数内部按需导入，避免只运行单个示例时加载全部依赖
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -23,6 +20,8 @@ async def example_basic_check():
     print("示例1: 执行基础系统检查")
     print("=" * 60)
 
+    from ops_graph import OpsAssistantGraph
+
     assistant = OpsAssistantGraph()
     result = await assistant.run("执行一次完整的系统健康检查")
 
@@ -41,6 +40,8 @@ async def example_monitoring_only():
     print("示例2: 获取Prometheus监控数据")
     print("=" * 60)
 
+    from monitoring import PrometheusClient
+
     prometheus = PrometheusClient()
 
     try:
@@ -72,6 +73,8 @@ async def example_remote_commands():
     print("示例3: 执行远程运维命令")
     print("=" * 60)
 
+    from remote_executor import RemoteExecutor
+
     with RemoteExecutor() as executor:
         try:
             print("🔍 获取系统基本信息...")
@@ -98,6 +101,9 @@ async def example_ai_analysis():
     print("示例4: AI智能系统分析")
     print("=" * 60)
 
+    from monitoring import PrometheusClient
+    from analyzer import SystemAnalyzer
+
     prometheus = PrometheusClient()
     analyzer = SystemAnalyzer()
 
@@ -143,6 +149,10 @@ async def example_custom_workflow():
     print("示例5: 自定义运维工作流程")
     print("=" * 60)
 
+    from monitoring import PrometheusClient
+    from analyzer import SystemAnalyzer
+    from remote_executor import RemoteExecutor
+
     prometheus = PrometheusClient()
     analyzer = SystemAnalyzer()
     executor = RemoteExecutor()
@@ -1,6 +1,8 @@
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 import logging
+import time
+from types import MappingProxyType
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
 
@@ -11,6 +13,13 @@ from analyzer import SystemAnalyzer
 
 logger = logging.getLogger(__name__)
 
+# 会话线程在checkpointer中的最长闲置时间(秒)，超时后清理
+THREAD_IDLE_TTL = 30 * 60
+
+# 条件边判断使用的常量
+_URGENT_LEVELS = frozenset(("high", "critical"))
+_EMPTY_RESULT = MappingProxyType({})
+
 class OpsAssistantGraph:
     """智能运维助手工作流图"""
 
@@ -20,6 +29,11 @@ class OpsAssistantGraph:
         self.system_analyzer = SystemAnalyzer()
         self.remote_executor = RemoteExecutor()
 
+        # 整个实例共享一个checkpointer，记录各线程最近一次使用时间
+        self.checkpointer = MemorySaver()
+        self._thread_last_used: Dict[str, float] = {}
+        self._run_config: Optional[Dict[str, Any]] = None
+
         # 创建工作流图
         self.graph = self._build_graph()
 
@@ -71,9 +85,7 @@ class OpsAssistantGraph:
         workflow.add_edge("handle_errors", "report_results")
         workflow.add_edge("report_results", END)
 
-        # 创建checkpointer
-        checkpointer = MemorySaver()
-        return workflow.compile(checkpointer=checkpointer)
+        return workflow.compile(checkpointer=self.checkpointer)
 
     async def _collect_metrics(self, state: OpsAssistantState) -> OpsAssistantState:
         """收集监控指标"""
@@ -98,11 +110,11 @@ class OpsAssistantGraph:
                 "timestamp": datetime.now().isoformat()
             })
 
-            logger.info(f"收集到 {len(metrics)} 个指标，{len(alerts)} 个告警")
+            logger.info("收集到 %d 个指标，%d 个告警", len(metrics), len(alerts))
             return self.state_manager.get_state()
 
         except Exception as e:
-            logger.error(f"收集监控指标失败: {e}")
+            logger.error("收集监控指标失败: %s", e)
             state["error_message"] = f"监控数据收集失败: {str(e)}"
             return state
 
@@ -143,11 +155,12 @@ class OpsAssistantGraph:
             # 保存分析数据到上下文
             state["context"]["analysis_result"] = parsed_result
 
-            logger.info(f"系统分析完成，检测到 {len(parsed_result.get('issues', []))} 个问题，{len(parsed_result.get('fix_plans', []))} 个修复计划")
+            logger.info("系统分析完成，检测到 %d 个问题，%d 个修复计划",
+                        len(parsed_result.get('issues', [])), len(parsed_result.get('fix_plans', [])))
             return self.state_manager.get_state()
 
         except Exception as e:
-            logger.error(f"系统分析失败: {e}")
+            logger.error("系统分析失败: %s", e)
             state["error_message"] = f"系统分析失败: {str(e)}"
             return state
 
@@ -176,11 +189,11 @@ class OpsAssistantGraph:
                 "timestamp": datetime.now().isoformat()
             })
 
-            logger.info(f"生成执行计划，包含 {len(execution_plan)} 个操作")
+            logger.info("生成执行计划，包含 %d 个操作", len(execution_plan))
             return self.state_manager.get_state()
 
         except Exception as e:
-            logger.error(f"生成执行计划失败: {e}")
+            logger.error("生成执行计划失败: %s", e)
             state["error_message"] = f"执行计划生成失败: {str(e)}"
             return state
 
@@ -198,7 +211,7 @@ class OpsAssistantGraph:
             # 连接到远程服务器
             with self.remote_executor as executor:
                 for i, command in enumerate(execution_plan):
-                    logger.info(f"执行操作 {i+1}/{len(execution_plan)}: {command}")
+                    logger.info("执行操作 %d/%d: %s", i + 1, len(execution_plan), command)
 
                     # 执行命令
                     result = executor.execute_command(command)
@@ -208,20 +221,20 @@ class OpsAssistantGraph:
 
                     # 如果执行失败，记录错误但继续执行其他命令
                     if not result.success:
-                        logger.warning(f"命令执行失败: {command}, 错误: {result.error}")
+                        logger.warning("命令执行失败: %s, 错误: %s", command, result.error)
 
             # 记录操作
             self.state_manager.add_action("execute_plan", {
                 "commands_executed": len(execution_plan),
-                "success_count": len([r for r in state["execution_results"] if r.success]),
+                "success_count": self.state_manager.state["execution_success_count"],
                 "timestamp": datetime.now().isoformat()
             })
 
-            logger.info(f"执行计划完成，共执行 {len(execution_plan)} 个操作")
+            logger.info("执行计划完成，共执行 %d 个操作", len(execution_plan))
             return self.state_manager.get_state()
 
         except Exception as e:
-            logger.error(f"执行计划失败: {e}")
+            logger.error("执行计划失败: %s", e)
             state["error_message"] = f"计划执行失败: {str(e)}"
             return state
 
@@ -247,14 +260,14 @@ class OpsAssistantGraph:
             return state
 
         except Exception as e:
-            logger.error(f"生成报告失败: {e}")
+            logger.error("生成报告失败: %s", e)
             state["error_message"] = f"报告生成失败: {str(e)}"
             return state
 
     async def _handle_errors(self, state: OpsAssistantState) -> OpsAssistantState:
         """处理错误"""
         error_message = state.get("error_message", "未知错误")
-        logger.error(f"处理错误: {error_message}")
+        logger.error("处理错误: %s", error_message)
 
         # 更新系统状态
         state["system_status"] = SystemStatus.CRITICAL
@@ -300,7 +313,7 @@ class OpsAssistantGraph:
         if state.get("error_message"):
             return "error"
 
-        analysis_result = state["context"].get("analysis_result", {})
+        analysis_result = state["context"].get("analysis_result") or _EMPTY_RESULT
 
         if not analysis_result:
             return "error"
@@ -317,15 +330,14 @@ class OpsAssistantGraph:
         if not state["execution_plan"]:
             return "skip_execution"
 
-        analysis_result = state["context"].get("analysis_result", {})
+        analysis_result = state["context"].get("analysis_result") or _EMPTY_RESULT
 
         # 如果分析建议自动修复，则执行
         if analysis_result.get("auto_fixable", False):
             return "execute"
 
         # 如果有严重问题，也执行
-        urgency = analysis_result.get("urgency", "low")
-        if urgency in ["high", "critical"]:
+        if analysis_result.get("urgency", "low") in _URGENT_LEVELS:
             return "execute"
 
         # 否则跳过执行，只报告
@@ -384,7 +396,9 @@ class OpsAssistantGraph:
         # 添加执行结果
         if state['execution_results']:
             report += "\n## 执行结果\n"
-            success_count = len([r for r in state['execution_results'] if r.success])
+            success_count = state.get('execution_success_count')
+            if success_count is None:
+                success_count = sum(1 for r in state['execution_results'] if r.success)
             report += f"成功执行: {success_count}/{len(state['execution_results'])} 个操作\n"
 
             # 显示最近的成功和失败操作
@@ -418,12 +432,12 @@ class OpsAssistantGraph:
             initial_state = self.state_manager.get_state()
 
             # 运行工作流
-            checkpointer = MemorySaver()
-            config = {"configurable": {"thread_id": self.state_manager.state["session_id"]}}
+            config = self._get_run_config(self.state_manager.state["session_id"])
+            self._reap_old_threads()
             final_state = await self.graph.ainvoke(initial_state, config=config)
 
             # 更新状态管理器
-            self.state_manager.state.update(final_state)
+            self.state_manager.update_state(final_state)
 
             # 记录对话
             if user_query and final_state.get("ai_response"):
@@ -439,7 +453,7 @@ class OpsAssistantGraph:
             }
 
         except Exception as e:
-            logger.error(f"智能运维助手运行失败: {e}")
+            logger.error("智能运维助手运行失败: %s", e)
             return {
                 "success": False,
                 "error": str(e),
@@ -447,6 +461,28 @@ class OpsAssistantGraph:
                 "response": f"智能运维助手运行失败: {str(e)}"
             }
 
+    def _get_run_config(self, thread_id: str) -> Dict[str, Any]:
+        """获取工作流运行配置，会话不变时复用同一个配置对象"""
+        if self._run_config is None or self._run_config["configurable"]["thread_id"] != thread_id:
+            self._run_config = {"configurable": {"thread_id": thread_id}}
+        self._thread_last_used[thread_id] = time.monotonic()
+        return self._run_config
+
+    def _reap_old_threads(self, max_idle: float = THREAD_IDLE_TTL):
+        """清理checkpointer中闲置过久的线程，避免内存无限增长"""
+        now = time.monotonic()
+        expired = [tid for tid, ts in self._thread_last_used.items() if now - ts > max_idle]
+
+        for thread_id in expired:
+            del self._thread_last_used[thread_id]
+            if hasattr(self.checkpointer, "delete_thread"):
+                self.checkpointer.delete_thread(thread_id)
+            else:
+                self.checkpointer.storage.pop(thread_id, None)
+
+        if expired:
+            logger.info("清理了 %d 个闲置会话线程", len(expired))
+
     def get_current_state(self) -> OpsAssistantState:
         """获取当前状态"""
         return self.state_manager.get_state()
\ No newline at end of file
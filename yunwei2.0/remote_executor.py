@@ -1,6 +1,11 @@
 import paramiko
+import asyncio
+import codecs
+import socket
+import threading
 import time
-from typing import Dict, List, Optional, Tuple
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 import logging
 import re
@@ -9,6 +14,9 @@ from states import ExecutionResult
 
 logger = logging.getLogger(__name__)
 
+# 流式读取命令输出时每次读取的字节数
+OUTPUT_CHUNK_SIZE = 4096
+
 class RemoteExecutor:
     """远程服务器命令执行器"""
 
@@ -52,8 +60,9 @@ class RemoteExecutor:
             self.ssh_client.close()
         logger.info("已断开SSH连接")
 
-    def execute_command(self, command: str, timeout: int = 30) -> ExecutionResult:
-        """执行远程命令"""
+    def execute_command(self, command: str, timeout: int = 30,
+                        on_output: Optional[Callable[[str, str], None]] = None) -> ExecutionResult:
+        """执行远程命令，指定on_output时按块回调stdout/stderr输出"""
         start_time = time.time()
 
         try:
@@ -68,8 +77,11 @@ class RemoteExecutor:
 
             stdin, stdout, stderr = self.ssh_client.exec_command(command, timeout=timeout)
 
-            output = stdout.read().decode('utf-8', errors='ignore').strip()
-            error = stderr.read().decode('utf-8', errors='ignore').strip()
+            if on_output is None:
+                output = stdout.read().decode('utf-8', errors='ignore').strip()
+                error = stderr.read().decode('utf-8', errors='ignore').strip()
+            else:
+                output, error = self._read_streaming(stdout.channel, timeout, on_output)
             exit_code = stdout.channel.recv_exit_status()
 
             execution_time = time.time() - start_time
@@ -107,6 +119,60 @@ class RemoteExecutor:
                 execution_time=time.time() - start_time
             )
 
+    def _read_streaming(self, channel: paramiko.Channel, timeout: int,
+                        on_output: Callable[[str, str], None]) -> Tuple[str, str]:
+        """分块读取通道输出，每读到一块即回调，超过timeout秒无输出视为超时"""
+        readers = (
+            ("stdout", channel.recv_ready, channel.recv),
+            ("stderr", channel.recv_stderr_ready, channel.recv_stderr),
+        )
+        # 增量解码，避免多字节字符被分块截断
+        decoders = {stream: codecs.getincrementaldecoder('utf-8')(errors='ignore') for stream, _, _ in readers}
+        parts = {"stdout": [], "stderr": []}
+
+        def _emit(stream: str, text: str):
+            if text:
+                parts[stream].append(text)
+                on_output(stream, text)
+
+        def _read_ready() -> bool:
+            received = False
+            for stream, ready, recv in readers:
+                if ready():
+                    received = True
+                    _emit(stream, decoders[stream].decode(recv(OUTPUT_CHUNK_SIZE)))
+            return received
+
+        last_activity = time.time()
+        while True:
+            if _read_ready():
+                last_activity = time.time()
+            elif channel.exit_status_ready():
+                break
+            elif time.time() - last_activity > timeout:
+                raise socket.timeout(f"命令超过{timeout}秒无输出")
+            else:
+                time.sleep(0.05)
+
+        # 退出状态可能先于剩余输出到达，继续读取两个流，直到都读空且收到EOF
+        last_activity = time.time()
+        while True:
+            if _read_ready():
+                last_activity = time.time()
+            elif channel.eof_received or channel.closed:
+                if not _read_ready():
+                    break
+            elif time.time() - last_activity > timeout:
+                raise socket.timeout(f"命令结束后超过{timeout}秒未收到剩余输出")
+            else:
+                time.sleep(0.01)
+
+        # 输出不完整的多字节字符
+        for stream, decoder in decoders.items():
+            _emit(stream, decoder.decode(b"", final=True))
+
+        return "".join(parts["stdout"]).strip(), "".join(parts["stderr"]).strip()
+
     def execute_commands(self, commands: List[str], timeout: int = 30) -> List[ExecutionResult]:
         """批量执行命令"""
         results = []
@@ -294,4 +360,91 @@ class RemoteExecutor:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """上下文管理器出口"""
-        self.disconnect()
\ No newline at end of file
+        self.disconnect()
+
+    def is_connected(self) -> bool:
+        """SSH连接是否仍然可用"""
+        transport = self.ssh_client.get_transport() if self.ssh_client else None
+        return transport is not None and transport.is_active()
+
+class RemoteExecutorPool:
+    """SSH连接池，按主机复用已建立的RemoteExecutor"""
+
+    def __init__(self, max_idle: int = 8, ttl: float = 300, keepalive: int = 30):
+        self.max_idle = max_idle  # 每台主机最多保留的空闲连接数
+        self.ttl = ttl  # 空闲连接的最长保留时间(秒)
+        self.keepalive = keepalive  # SSH keepalive间隔(秒)
+        self._idle: Dict[Tuple, List[Tuple[RemoteExecutor, float]]] = {}
+        self._lock = threading.Lock()
+        self.pool_hit_total = 0
+        self.pool_miss_total = 0
+
+    @staticmethod
+    def _key(server_config: Dict) -> Tuple:
+        return (server_config["hostname"], server_config["port"], server_config["username"])
+
+    def _checkout(self, key: Tuple) -> Optional[RemoteExecutor]:
+        """取出一个未过期且仍然存活的空闲连接"""
+        expired = []
+        executor = None
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                candidate, released_at = idle.pop()
+                if now - released_at <= self.ttl and candidate.is_connected():
+                    executor = candidate
+                    break
+                expired.append(candidate)
+
+        for stale in expired:
+            stale.disconnect()
+        return executor
+
+    def get(self, server_config: Dict = None) -> RemoteExecutor:
+        """获取连接，优先复用空闲连接（阻塞，需在线程中调用）"""
+        server_config = server_config or Config.get_server_config()
+        executor = self._checkout(self._key(server_config))
+        with self._lock:
+            if executor is not None:
+                self.pool_hit_total += 1
+            else:
+                self.pool_miss_total += 1
+        if executor is not None:
+            return executor
+
+        executor = RemoteExecutor(server_config)
+        if executor.connect():
+            executor.ssh_client.get_transport().set_keepalive(self.keepalive)
+        return executor
+
+    def release(self, executor: RemoteExecutor, discard: bool = False):
+        """归还连接，出错或超出容量时直接关闭"""
+        if not discard and executor.is_connected():
+            with self._lock:
+                idle = self._idle.setdefault(self._key(executor.server_config), [])
+                if len(idle) < self.max_idle:
+                    idle.append((executor, time.monotonic()))
+                    return
+        executor.disconnect()
+
+    @asynccontextmanager
+    async def acquire(self, server_config: Dict = None):
+        """异步获取连接，退出时自动归还"""
+        executor = await asyncio.to_thread(self.get, server_config)
+        discard = False
+        try:
+            yield executor
+        except BaseException:
+            discard = True
+            raise
+        finally:
+            await asyncio.to_thread(self.release, executor, discard)
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            idle_executors = [executor for idle in self._idle.values() for executor, _ in idle]
+            self._idle.clear()
+        for executor in idle_executors:
+            executor.disconnect()
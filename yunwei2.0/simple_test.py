@@ -15,8 +15,6 @@ async def test_basic_functionality():
         # 测试导入
         print("1. 测试模块导入...")
         from ops_graph import OpsAssistantGraph
-        from analyzer import SystemAnalyzer
-        from states import AlertLevel, SystemStatus
         print("   导入成功")
 
         # 测试运维助手创建
@@ -26,6 +24,7 @@ async def test_basic_functionality():
 
         # 测试分析器创建
         print("3. 测试AI分析器创建...")
+        from analyzer import SystemAnalyzer
         analyzer = SystemAnalyzer()
         print("   创建成功")
 
@@ -5,31 +5,59 @@
 
 import os
 import sys
-import subprocess
+import hashlib
+import importlib.util
 import webbrowser
 import time
 from pathlib import Path
 
+# 脚本所在目录（web_app模块所在位置）
+THIS_DIR = str(Path(__file__).resolve().parent)
+
+# 依赖检查通过的记录文件，解释器和requirements.txt不变时跳过检查
+DEPS_STAMP_FILE = Path("~/.cache/yunwei/deps.ok").expanduser()
+
+# 启动前检查的依赖包，web_app在模块顶层导入这些包
+REQUIRED_PACKAGES = (
+    'fastapi',
+    'uvicorn',
+    'websockets',
+    'pydantic',
+    'orjson'
+)
+
+def _dependencies_key() -> str:
+    """根据解释器和requirements.txt生成依赖检查的缓存键"""
+    requirements = Path(THIS_DIR) / "requirements.txt"
+    mtime = requirements.stat().st_mtime if requirements.exists() else 0
+    packages = ",".join(REQUIRED_PACKAGES)
+    return hashlib.sha1(f"{sys.executable}|{sys.version}|{mtime}|{packages}".encode()).hexdigest()
+
 def check_dependencies():
     """检查依赖是否安装"""
     print("检查Web应用依赖...")
 
-    required_packages = [
-        'fastapi',
-        'uvicorn',
-        'websockets',
-        'pydantic'
-    ]
+    key = _dependencies_key()
+    try:
+        if DEPS_STAMP_FILE.read_text() == key:
+            print("依赖检查通过（使用缓存结果）")
+            return True
+    except OSError:
+        pass
 
     missing_packages = []
+    lines = []
 
-    for package in required_packages:
-        try:
-            __import__(package)
-            print(f"[OK] {package} 已安装")
-        except ImportError:
+    # 只查找模块位置，不执行模块代码；检查结果汇总后一次性输出
+    for package in REQUIRED_PACKAGES:
+        if importlib.util.find_spec(package) is not None:
+            lines.append(f"[OK] {package} 已安装")
+        else:
             missing_packages.append(package)
-            print(f"[ERROR] {package} 未安装")
+            lines.append(f"[ERROR] {package} 未安装")
+
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
 
     if missing_packages:
         print(f"\n缺少依赖包: {', '.join(missing_packages)}")
@@ -37,34 +65,58 @@ def check_dependencies():
         return False
 
     print("所有依赖检查通过!")
+
+    try:
+        DEPS_STAMP_FILE.parent.mkdir(parents=True, exist_ok=True)
+        DEPS_STAMP_FILE.write_text(key)
+    except OSError:
+        pass
+
     return True
 
+def _get_workers() -> int:
+    """读取YUNWEI_WORKERS环境变量，取值无效时提示并回退为单worker"""
+    value = os.environ.get("YUNWEI_WORKERS", "1")
+    try:
+        workers = int(value)
+    except ValueError:
+        workers = 0
+    if workers < 1:
+        print(f"[WARNING] YUNWEI_WORKERS={value!r} 不是正整数，使用单worker启动")
+        return 1
+    return workers
+
 def start_web_server():
     """启动Web服务器"""
     print("\n启动智能运维助手Web服务...")
     print("=" * 50)
 
-    # 设置环境变量
-    env = os.environ.copy()
-    env['PYTHONPATH'] = str(Path(__file__).parent)
+    # 确保web_app模块可以被导入
+    if THIS_DIR not in sys.path:
+        sys.path.insert(0, THIS_DIR)
 
     try:
-        # 启动uvicorn服务器
-        cmd = [
-            sys.executable, '-m', 'uvicorn',
-            'web_app:app',
-            '--host', '0.0.0.0',
-            '--port', '8000',
-            '--reload',
-            '--log-level', 'info'
-        ]
+        import uvicorn
 
         print("服务器地址: http://localhost:8000")
         print("按 Ctrl+C 停止服务器")
         print("=" * 50)
 
-        # 等待服务器启动
-        subprocess.run(cmd, env=env)
+        # 开发模式(YUNWEI_DEV=1)才启用文件监视自动重载
+        dev_mode = os.environ.get("YUNWEI_DEV") == "1"
+
+        # 运维状态保存在进程内存中，默认单worker；多worker需显式设置YUNWEI_WORKERS
+        workers = 1 if dev_mode else _get_workers()
+
+        # 在当前进程中启动uvicorn服务器，避免再启动一个解释器
+        uvicorn.run(
+            "web_app:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=dev_mode,
+            workers=workers,
+            log_level="info"
+        )
 
     except KeyboardInterrupt:
         print("\n服务器已停止")
@@ -77,7 +129,18 @@ def start_web_server():
 def open_browser():
     """打开浏览器"""
     def delayed_open():
-        time.sleep(2)  # 等待服务器启动
+        import requests
+
+        # 轮询状态接口，服务器就绪后立即打开浏览器（最多约5秒）
+        with requests.Session() as session:
+            for _ in range(50):
+                try:
+                    if session.get('http://localhost:8000/api/status', timeout=0.2).status_code == 200:
+                        break
+                except requests.RequestException:
+                    pass
+                time.sleep(0.1)
+
         try:
             webbrowser.open('http://localhost:8000')
             print("已在浏览器中打开 http://localhost:8000")
@@ -98,9 +161,12 @@ def main():
     if not check_dependencies():
         sys.exit(1)
 
-    # 询问是否打开浏览器
+    # 询问是否打开浏览器；非交互环境(systemd、CI等)下读取YUNWEI_OPEN_BROWSER，默认不打开
     try:
-        response = input("\n是否自动打开浏览器? (y/n): ").lower().strip()
+        if sys.stdin.isatty():
+            response = input("\n是否自动打开浏览器? (y/n): ").lower().strip()
+        else:
+            response = os.environ.get("YUNWEI_OPEN_BROWSER", "n").lower().strip()
         if response in ['y', 'yes', '是']:
             open_browser()
     except KeyboardInterrupt:
@@ -1,6 +1,6 @@
-from typing import Dict, List, Optional, Any, TypedDict
+from typing import Dict, List, Optional, Any, Tuple, TypedDict
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 
 class AlertLevel(Enum):
@@ -51,6 +51,26 @@ class ExecutionResult:
         if self.timestamp is None:
             self.timestamp = datetime.now()
 
+@dataclass
+class PlanIndex:
+    """修复方案索引，按id直接定位方案"""
+    by_id: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # 方案id及"plan_序号"形式的别名到列表下标的映射
+    positions: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, fix_plans: List[Dict[str, Any]]) -> "PlanIndex":
+        """根据修复方案列表构建索引，id重复时以靠前的方案为准"""
+        index = cls()
+        for i, plan in enumerate(fix_plans):
+            plan_id = plan.get("id")
+            if plan_id:
+                index.by_id.setdefault(plan_id, plan)
+                index.positions.setdefault(plan_id, i)
+        for i in range(len(fix_plans)):
+            index.positions.setdefault(f"plan_{i+1}", i)
+        return index
+
 class OpsAssistantState(TypedDict):
     """智能运维助手状态管理"""
     # 基础状态
@@ -72,6 +92,7 @@ class OpsAssistantState(TypedDict):
     selected_plan: Optional[Dict[str, Any]]
     execution_plan: List[str]
     execution_results: List[ExecutionResult]
+    execution_success_count: int
 
     # 执行状态
     current_execution_step: Optional[int]
@@ -110,6 +131,7 @@ class StateManager:
             "selected_plan": None,
             "execution_plan": [],
             "execution_results": [],
+            "execution_success_count": 0,
             "current_execution_step": None,
             "execution_in_progress": False,
             "execution_phase": "idle",
@@ -123,6 +145,9 @@ class StateManager:
             "action_history": [],
             "fix_execution_history": []
         }
+        self.plan_index = PlanIndex()
+        # 状态版本号，每次写操作递增，供接口生成ETag
+        self.version = 0
 
     def _generate_session_id(self) -> str:
         """生成会话ID"""
@@ -131,11 +156,13 @@ class StateManager:
 
     def update_metrics(self, metrics: List[MetricValue]):
         """更新监控指标"""
+        self.version += 1
         self.state["metrics"] = metrics
         self.state["timestamp"] = datetime.now()
 
     def add_alert(self, alert: SystemAlert):
         """添加告警"""
+        self.version += 1
         self.state["alerts"].append(alert)
 
         # 更新系统状态
@@ -146,69 +173,95 @@ class StateManager:
 
     def update_analysis(self, result: str, issues: List[str], analysis_data: Dict[str, Any] = None):
         """更新分析结果"""
+        self.version += 1
         self.state["analysis_result"] = result
         self.state["detected_issues"] = issues
         self.state["analysis_data"] = analysis_data or {}
 
     def set_fix_plans(self, fix_plans: List[Dict[str, Any]]):
         """设置修复计划"""
+        self.version += 1
         self.state["fix_plans"] = fix_plans
         self.state["requires_approval"] = len(fix_plans) > 0
+        self.plan_index = PlanIndex.build(fix_plans)
 
     def select_fix_plan(self, plan_id: str):
         """选择修复计划"""
-        for plan in self.state["fix_plans"]:
-            if plan.get("id") == plan_id:
-                self.state["selected_plan"] = plan
-                self.state["user_approval"] = False
-                return True
-        return False
+        self.version += 1
+        plan = self.plan_index.by_id.get(plan_id)
+        if plan is None:
+            return False
+        self.state["selected_plan"] = plan
+        self.state["user_approval"] = False
+        return True
+
+    def get_plan_by_id(self, plan_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """按方案id或"plan_序号"别名查找修复方案，返回(下标, 方案)"""
+        index = self.plan_index.positions.get(plan_id)
+        if index is None:
+            return None
+        return index, self.state["fix_plans"][index]
 
     def approve_fix_plan(self):
         """批准修复计划"""
+        self.version += 1
         self.state["user_approval"] = True
 
     def start_execution(self):
         """开始执行修复计划"""
+        self.version += 1
         self.state["execution_in_progress"] = True
         self.state["current_execution_step"] = 0
         self.state["execution_phase"] = "executing"
         self.state["execution_results"] = []
+        self.state["execution_success_count"] = 0
 
     def set_execution_step(self, step: int):
         """设置当前执行步骤"""
+        self.version += 1
         self.state["current_execution_step"] = step
 
     def add_execution_result(self, result: ExecutionResult):
         """添加执行结果"""
+        self.version += 1
         self.state["execution_results"].append(result)
+        if result.success:
+            self.state["execution_success_count"] += 1
 
     def complete_execution(self):
         """完成执行"""
+        self.version += 1
         self.state["execution_in_progress"] = False
         self.state["execution_phase"] = "completed"
 
     def fail_execution(self):
         """执行失败"""
+        self.version += 1
         self.state["execution_in_progress"] = False
         self.state["execution_phase"] = "failed"
 
     def rollback_execution(self):
         """回滚执行"""
+        self.version += 1
         self.state["execution_in_progress"] = False
         self.state["execution_phase"] = "rolled_back"
 
     def set_execution_plan(self, plan: List[str]):
         """设置执行计划"""
+        self.version += 1
         self.state["execution_plan"] = plan
         self.state["requires_approval"] = len(plan) > 0
 
     def add_execution_result(self, result: ExecutionResult):
         """添加执行结果"""
+        self.version += 1
         self.state["execution_results"].append(result)
+        if result.success:
+            self.state["execution_success_count"] += 1
 
     def add_conversation(self, user_msg: str, ai_msg: str):
         """添加对话记录"""
+        self.version += 1
         self.state["conversation_history"].append({
             "user": user_msg,
             "ai": ai_msg,
@@ -217,6 +270,7 @@ class StateManager:
 
     def add_action(self, action_type: str, details: Dict[str, Any]):
         """添加操作记录"""
+        self.version += 1
         self.state["action_history"].append({
             "type": action_type,
             "details": details,
@@ -225,6 +279,7 @@ class StateManager:
 
     def reset_state(self):
         """重置状态"""
+        self.version += 1
         self.state.update({
             "metrics": [],
             "alerts": [],
@@ -235,6 +290,7 @@ class StateManager:
             "selected_plan": None,
             "execution_plan": [],
             "execution_results": [],
+            "execution_success_count": 0,
             "current_execution_step": None,
             "execution_in_progress": False,
             "execution_phase": "idle",
@@ -242,6 +298,15 @@ class StateManager:
             "error_message": None,
             "system_status": SystemStatus.UNKNOWN
         })
+        self.plan_index = PlanIndex()
+
+    def update_state(self, values: Dict[str, Any]):
+        """合并工作流返回的状态"""
+        self.version += 1
+        self.state.update(values)
+        # 修复方案列表可能被替换，索引需随之重建
+        if "fix_plans" in values:
+            self.plan_index = PlanIndex.build(self.state["fix_plans"] or [])
 
     def get_state(self) -> OpsAssistantState:
         """获取当前状态"""
@@ -34,6 +34,7 @@ function initializeWebSocket() {
     websocket.onopen = function(event) {
         console.log('WebSocket连接已建立');
         updateConnectionStatus(true);
+        updatePushSubscription();
     };
 
     websocket.onmessage = function(event) {
@@ -54,9 +55,33 @@ function initializeWebSocket() {
     };
 }
 
+// 订阅服务端推送的监控指标和告警，页面不可见时取消订阅
+function updatePushSubscription() {
+    if (websocket && websocket.readyState === WebSocket.OPEN) {
+        const topics = document.visibilityState === 'visible' ? ['metrics', 'alerts'] : [];
+        websocket.send(JSON.stringify({ type: 'subscribe', topics: topics }));
+    }
+}
+
+// 是否由WebSocket推送监控数据
+function isPushActive() {
+    return websocket && websocket.readyState === WebSocket.OPEN;
+}
+
 // 处理WebSocket消息
 function handleWebSocketMessage(data) {
     switch (data.type) {
+        case 'metrics_tick':
+            applyMetricsData(data.data);
+            if (currentSection === 'metrics') {
+                displayAllMetrics(data.data);
+            }
+            break;
+        case 'alerts_tick':
+            if (currentSection === 'alerts') {
+                displayAlertsData(data.data);
+            }
+            break;
         case 'check_started':
             updateCheckStatus('正在收集监控数据和分析系统状态...');
             break;
@@ -106,6 +131,12 @@ function handleWebSocketMessage(data) {
         case 'execution_started':
             showNotification('info', '执行开始', data.message);
             break;
+        case 'cmd_output':
+            appendCommandOutput(data);
+            break;
+        case 'command_completed':
+            document.getElementById('executionStatus').textContent = `执行中 (${data.step}/${data.total})`;
+            break;
         case 'execution_completed':
             showNotification('success', '执行完成', data.message);
             if (data.success) {
@@ -294,7 +325,15 @@ async function loadChartsData() {
     try {
         const response = await fetch('/api/metrics');
         const data = await response.json();
+        applyMetricsData(data);
+    } catch (error) {
+        console.error('加载图表数据失败:', error);
+    }
+}
 
+// 用监控指标更新图表
+function applyMetricsData(data) {
+    try {
         // 更新CPU图表
         const cpuMetric = data.cpu_metrics.find(m => m.name === 'cpu_usage_percent');
         if (cpuMetric) {
@@ -308,7 +347,7 @@ async function loadChartsData() {
         }
 
     } catch (error) {
-        console.error('加载图表数据失败:', error);
+        console.error('更新图表失败:', error);
     }
 }
 
@@ -338,18 +377,21 @@ async function loadMetricsData() {
     try {
         const response = await fetch('/api/metrics');
         const data = await response.json();
-
-        displayMetricsList('cpuMetricsList', data.cpu_metrics);
-        displayMetricsList('memoryMetricsList', data.memory_metrics);
-        displayMetricsList('diskMetricsList', data.disk_metrics);
-        displayMetricsList('networkMetricsList', data.network_metrics);
-
+        displayAllMetrics(data);
     } catch (error) {
         console.error('加载监控指标失败:', error);
         showNotification('error', '数据加载失败', error.message);
     }
 }
 
+// 显示全部分类的指标
+function displayAllMetrics(data) {
+    displayMetricsList('cpuMetricsList', data.cpu_metrics);
+    displayMetricsList('memoryMetricsList', data.memory_metrics);
+    displayMetricsList('diskMetricsList', data.disk_metrics);
+    displayMetricsList('networkMetricsList', data.network_metrics);
+}
+
 // 显示指标列表
 function displayMetricsList(containerId, metrics) {
     const container = document.getElementById(containerId);
@@ -384,20 +426,23 @@ async function loadAlertsData() {
     try {
         const response = await fetch('/api/alerts');
         const data = await response.json();
-
-        // 更新徽章
-        document.getElementById('criticalAlertsBadge').textContent = `${data.critical_count} 严重`;
-        document.getElementById('warningAlertsBadge').textContent = `${data.warning_count} 警告`;
-
-        // 显示告警列表
-        displayAlertsList(data.alerts);
-
+        displayAlertsData(data);
     } catch (error) {
         console.error('加载告警数据失败:', error);
         showNotification('error', '数据加载失败', error.message);
     }
 }
 
+// 显示告警徽章和列表
+function displayAlertsData(data) {
+    // 更新徽章
+    document.getElementById('criticalAlertsBadge').textContent = `${data.critical_count} 严重`;
+    document.getElementById('warningAlertsBadge').textContent = `${data.warning_count} 警告`;
+
+    // 显示告警列表
+    displayAlertsList(data.alerts);
+}
+
 // 显示告警列表
 function displayAlertsList(alerts) {
     const container = document.getElementById('alertsList');
@@ -626,12 +671,21 @@ function updateCheckStatus(message) {
 // 刷新数据
 function refreshData() {
     loadStatusData();
-    loadChartsData();
+
+    // WebSocket连接正常时监控指标和告警由服务端推送，无需轮询
+    const pushActive = isPushActive();
+    if (!pushActive) {
+        loadChartsData();
+    }
 
     if (currentSection === 'metrics') {
-        loadMetricsData();
+        if (!pushActive) {
+            loadMetricsData();
+        }
     } else if (currentSection === 'alerts') {
-        loadAlertsData();
+        if (!pushActive) {
+            loadAlertsData();
+        }
     } else if (currentSection === 'history') {
         loadHistoryData();
     } else if (currentSection === 'config') {
@@ -689,6 +743,7 @@ function closeModal(modalId) {
 
 // 页面可见性变化时的处理
 document.addEventListener('visibilitychange', function() {
+    updatePushSubscription();
     if (document.visibilityState === 'visible') {
         // 页面变为可见时刷新数据
         refreshData();
@@ -1884,6 +1939,21 @@ async function executePlanFromModal() {
     await approvePlan(window.selectedPlanId);
 }
 
+// 实时追加命令输出
+function appendCommandOutput(data) {
+    document.getElementById('executionResultsSection').style.display = 'block';
+
+    let output = document.getElementById('liveCommandOutput');
+    if (!output) {
+        document.getElementById('executionResultsContent').innerHTML =
+            '<pre id="liveCommandOutput" class="bg-dark text-light p-2 small mb-0" style="max-height: 300px; overflow-y: auto;"></pre>';
+        output = document.getElementById('liveCommandOutput');
+    }
+
+    output.textContent += data.chunk;
+    output.scrollTop = output.scrollHeight;
+}
+
 // 监控执行结果
 async function monitorExecutionResults(planId) {
     const resultsContent = document.getElementById('executionResultsContent');
@@ -4,7 +4,46 @@
 """
 
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import re
+import orjson
+
+# 所有测试请求共用一个会话，复用到服务器的keep-alive连接
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+
+# (连接超时, 读取超时)
+REQUEST_TIMEOUT = (1, 5)
+
+# 修复方案的本地缓存，配合ETag/If-None-Match避免重复下载未变化的数据
+CACHE_DIR = Path("~/.cache/yunwei").expanduser()
+FIX_PLANS_ETAG_FILE = CACHE_DIR / "fix-plans.etag"
+FIX_PLANS_CACHE_FILE = CACHE_DIR / "fix-plans.json"
+
+# 危险命令特征合并为一个正则，一次扫描即可完成匹配
+DANGEROUS_COMMAND_RE = re.compile(
+    r"rm\s+-rf\s+/"
+    r"|dd\s+if=/dev/zero"
+    r"|shutdown\s+-h"
+    r"|curl\s+\S+\s*\|\s*sh"
+)
+
+def _fix_plans_request_headers():
+    """构建带缓存校验的修复方案请求头"""
+    if FIX_PLANS_ETAG_FILE.exists() and FIX_PLANS_CACHE_FILE.exists():
+        return {"If-None-Match": FIX_PLANS_ETAG_FILE.read_text(encoding="utf-8").strip()}
+    return {}
+
+def _save_fix_plans_cache(response):
+    """保存修复方案响应及其ETag"""
+    etag = response.headers.get("ETag")
+    if not etag:
+        return
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    FIX_PLANS_CACHE_FILE.write_bytes(response.content)
+    FIX_PLANS_ETAG_FILE.write_text(etag, encoding="utf-8")
 
 def test_command_edit_api():
     """测试命令编辑API"""
@@ -13,13 +52,21 @@ def test_command_edit_api():
     print("🧪 测试代码编辑功能")
     print("=" * 50)
 
+    # 状态检查和修复方案获取互不依赖，并发发出两个请求
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        status_future = executor.submit(SESSION.get, f"{base_url}/api/status", timeout=REQUEST_TIMEOUT)
+        plans_future = executor.submit(
+            SESSION.get, f"{base_url}/api/fix-plans",
+            headers=_fix_plans_request_headers(), timeout=REQUEST_TIMEOUT
+        )
+
     # 1. 测试基本连接
     print("1. 测试API连接...")
     try:
-        response = requests.get(f"{base_url}/api/status")
+        response = status_future.result()
         if response.status_code == 200:
             print("✅ API连接成功")
-            print(f"   系统状态: {response.json()['status']}")
+            print(f"   系统状态: {orjson.loads(response.content)['status']}")
         else:
             print("❌ API连接失败")
             return False
@@ -30,26 +77,31 @@ def test_command_edit_api():
     # 2. 获取修复方案
     print("\n2. 获取修复方案...")
     try:
-        response = requests.get(f"{base_url}/api/fix-plans")
-        if response.status_code == 200:
-            fix_plans_data = response.json()
-            print(f"✅ 成功获取 {fix_plans_data.get('count', 0)} 个修复方案")
-
-            if fix_plans_data.get('fix_plans'):
-                plan = fix_plans_data['fix_plans'][0]
-                print(f"   第一个方案ID: {plan.get('id')}")
-                print(f"   问题描述: {plan.get('issue')}")
-
-                if plan.get('commands'):
-                    command = plan['commands'][0]
-                    print(f"   第一个命令: {command.get('command')}")
-                    return True, plan.get('id'), 0, command.get('command')
-            else:
-                print("❌ 没有找到修复方案")
-                return False
+        response = plans_future.result()
+        if response.status_code == 304:
+            fix_plans_data = orjson.loads(FIX_PLANS_CACHE_FILE.read_bytes())
+            print("✅ 修复方案未变化，使用本地缓存")
+        elif response.status_code == 200:
+            fix_plans_data = orjson.loads(response.content)
+            _save_fix_plans_cache(response)
         else:
             print(f"❌ 获取修复方案失败: {response.status_code}")
             return False
+
+        print(f"✅ 成功获取 {fix_plans_data.get('count', 0)} 个修复方案")
+
+        if fix_plans_data.get('fix_plans'):
+            plan = fix_plans_data['fix_plans'][0]
+            print(f"   第一个方案ID: {plan.get('id')}")
+            print(f"   问题描述: {plan.get('issue')}")
+
+            if plan.get('commands'):
+                command = plan['commands'][0]
+                print(f"   第一个命令: {command.get('command')}")
+                return True, plan.get('id'), 0, command.get('command')
+        else:
+            print("❌ 没有找到修复方案")
+            return False
     except Exception as e:
         print(f"❌ 获取修复方案错误: {e}")
         return False
@@ -68,7 +120,10 @@ def test_security_validation():
     ]
 
     for cmd in safe_commands:
-        print(f"   ✅ 安全命令测试通过: {cmd}")
+        if DANGEROUS_COMMAND_RE.search(cmd):
+            print(f"   ❌ 安全命令被误判为危险: {cmd}")
+        else:
+            print(f"   ✅ 安全命令测试通过: {cmd}")
 
     # 测试危险命令
     dangerous_commands = [
@@ -79,7 +134,10 @@ def test_security_validation():
     ]
 
     for cmd in dangerous_commands:
-        print(f"   ⚠️  危险命令检测到: {cmd}")
+        if DANGEROUS_COMMAND_RE.search(cmd):
+            print(f"   ⚠️  危险命令检测到: {cmd}")
+        else:
+            print(f"   ❌ 危险命令未被检测到: {cmd}")
 
 def main():
     """主函数"""
@@ -5,28 +5,65 @@
 """
 
 import asyncio
+import functools
+import hashlib
 import json
 import logging
+import re
+import time
+from collections import Counter
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from typing import Dict, List, Any, Optional, Set
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from langchain_core.messages import HumanMessage, SystemMessage
+import orjson
 import uvicorn
 
 # 导入智能运维助手组件
 from ops_graph import OpsAssistantGraph
 from monitoring import PrometheusClient
-from remote_executor import RemoteExecutor
+from remote_executor import RemoteExecutor, RemoteExecutorPool
 from config import Config
 from analyzer import SystemAnalyzer
+from states import ExecutionResult, PlanIndex
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="智能运维助手API", version="1.0.0")
+# LLM不可用时的预设回复，按匹配到的关键词选择，占位符在选中后再填充
+_PREDEFINED_CHAT_RESPONSES = {
+    'status': '当前系统状态为: {system_status}。系统中监测到{metrics_count}个性能指标和{alerts_count}个活跃告警。',
+    'check': '如需执行系统检查，请点击控制台页面中的"执行系统检查"按钮。这会触发AI分析系统状态并生成修复方案。',
+    'cpu': '当前监控到{metrics_count}个系统指标。请查看监控指标页面获取详细的CPU使用率数据，包括实时使用情况、系统负载等信息。',
+    'memory': '内存使用情况请查看监控指标页面。如果内存使用率过高，建议检查内存占用高的进程，考虑清理系统缓存或重启相关服务。',
+    'disk': '磁盘使用情况请查看监控指标页面。建议定期清理临时文件、日志文件和不需要的数据，确保有足够的磁盘空间。',
+    'alerts': '当前系统有{alerts_count}个活跃告警。请查看告警管理页面了解详细信息，并根据AI建议采取相应措施。',
+    'optimize': '系统优化建议：1) 监控CPU和内存使用率，避免资源瓶颈 2) 定期清理临时文件和日志 3) 及时更新系统补丁 4) 优化数据库查询 5) 监控网络连接数',
+    'default': '我建议您查看系统控制台了解当前状态，或者询问具体的技术问题，如CPU使用率、内存情况、磁盘空间等。我会根据实时数据提供专业的建议。'
+}
+_CHAT_KEYWORDS_RE = re.compile(r'(status|check|cpu|memory|disk|alerts|optimize)', re.IGNORECASE)
+
+def _orjson_default(obj):
+    """orjson无法直接序列化的对象转换为字典（datetime、枚举、dataclass由orjson原生处理）"""
+    if hasattr(obj, '__dict__'):
+        return {key: value for key, value in obj.__dict__.items() if not key.startswith('_')}
+    raise TypeError(f"无法序列化的类型: {type(obj).__name__}")
+
+class AppJSONResponse(ORJSONResponse):
+    """使用orjson序列化的JSON响应，支持自定义对象"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_orjson_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+
+app = FastAPI(title="智能运维助手API", version="1.0.0", default_response_class=AppJSONResponse)
 
 # 配置CORS
 app.add_middleware(
@@ -42,7 +79,24 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # 全局变量
 ops_assistant = OpsAssistantGraph()
-active_connections: List[WebSocket] = []
+
+# 共享的Prometheus客户端和指标缓存
+prometheus_client = PrometheusClient()
+# SSH连接池，避免每次执行命令都重新握手认证
+executor_pool = RemoteExecutorPool(max_idle=8, ttl=300)
+_metrics_cache: Dict[str, Any] = {"metrics": None, "fetched_at": 0.0}
+_metrics_lock = asyncio.Lock()
+
+async def get_cached_metrics(ttl: float = Config.METRICS_CACHE_TTL):
+    """获取监控指标，TTL内复用缓存，并发请求只会触发一次Prometheus拉取"""
+    async with _metrics_lock:
+        if _metrics_cache["metrics"] is not None and time.monotonic() - _metrics_cache["fetched_at"] < ttl:
+            return _metrics_cache["metrics"]
+
+        metrics = await asyncio.to_thread(prometheus_client.fetch_metrics)
+        _metrics_cache["metrics"] = metrics
+        _metrics_cache["fetched_at"] = time.monotonic()
+        return metrics
 
 # 辅助函数：处理datetime对象的JSON序列化
 def serialize_datetime(obj):
@@ -59,31 +113,170 @@ def serialize_datetime(obj):
     else:
         return obj
 
+def state_etag() -> str:
+    """根据状态版本号生成ETag，状态未写入时保持不变，无需序列化响应体"""
+    state_manager = ops_assistant.state_manager
+    return f'W/"{state_manager.state["session_id"]}-{state_manager.version}"'
+
+def state_not_modified(request: Request, etag: str) -> Optional[Response]:
+    """客户端缓存仍然有效时返回304响应"""
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+# 配置在进程内不变，响应体和ETag只在启动时计算一次
+_CONFIG_BODY = orjson.dumps({
+    "server_host": Config.SERVER_HOST,
+    "prometheus_url": Config.PROMETHEUS_URL,
+    "llm_model": Config.LLM_MODEL,
+    "thresholds": Config.THRESHOLDS
+})
+_CONFIG_ETAG = f'"{hashlib.blake2b(_CONFIG_BODY, digest_size=8).hexdigest()}"'
+_CONFIG_HEADERS = {"ETag": _CONFIG_ETAG, "Cache-Control": "max-age=3600"}
+
+def bucket_metrics(metrics) -> Dict[str, List[Dict[str, Any]]]:
+    """单次遍历将监控指标按类型分组"""
+    buckets = {'cpu': [], 'memory': [], 'disk': [], 'network': [], 'system': []}
+
+    for metric in metrics:
+        name = metric.name.lower()
+        if 'cpu' in name:
+            buckets['cpu'].append(metric.__dict__)
+        elif 'memory' in name:
+            buckets['memory'].append(metric.__dict__)
+        elif 'disk' in name:
+            buckets['disk'].append(metric.__dict__)
+        elif 'network' in name or 'tcp' in name:
+            buckets['network'].append(metric.__dict__)
+        elif 'load' in name:
+            buckets['system'].append(metric.__dict__)
+
+    return buckets
+
+def summarize_alerts(alerts) -> Dict[str, int]:
+    """单次遍历统计告警总数及各级别数量"""
+    levels = Counter(getattr(getattr(alert, 'level', None), 'value', None) for alert in alerts)
+    return {
+        "total": len(alerts),
+        "critical": levels['critical'],
+        "warning": levels['warning']
+    }
+
+def build_metrics_payload(metrics) -> Dict[str, Any]:
+    """构建监控指标响应数据，接口和WebSocket推送共用"""
+    buckets = bucket_metrics(metrics)
+    return {
+        "cpu_metrics": buckets['cpu'],
+        "memory_metrics": buckets['memory'],
+        "disk_metrics": buckets['disk'],
+        "network_metrics": buckets['network'],
+        "system_metrics": buckets['system'],
+        "timestamp": datetime.now()
+    }
+
+def build_alerts_payload(metrics) -> Dict[str, Any]:
+    """构建告警响应数据，接口和WebSocket推送共用"""
+    alerts = prometheus_client.detect_alerts(metrics)
+    alert_summary = summarize_alerts(alerts)
+    return {
+        "alerts": alerts,
+        "count": alert_summary["total"],
+        "critical_count": alert_summary["critical"],
+        "warning_count": alert_summary["warning"]
+    }
+
 # WebSocket连接管理器
 class ConnectionManager:
+    # 每批并发发送的连接数，批次之间让出事件循环
+    BROADCAST_BATCH_SIZE = 50
+    # 客户端可订阅的推送主题
+    TOPICS = frozenset(("metrics", "alerts"))
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[WebSocket] = set()
+        self.subscriptions: Dict[WebSocket, Set[str]] = {}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        self.active_connections.discard(websocket)
+        self.subscriptions.pop(websocket, None)
+
+    def subscribe(self, websocket: WebSocket, topics: List[str]):
+        """设置连接订阅的主题，传入空列表即取消全部订阅"""
+        self.subscriptions[websocket] = self.TOPICS.intersection(topics)
+
+    def has_subscribers(self, topic: str) -> bool:
+        return any(topic in topics for topics in self.subscriptions.values())
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                # 连接已断开，从列表中移除
-                self.active_connections.remove(connection)
+    async def broadcast_json(self, message: Dict[str, Any], topic: Optional[str] = None):
+        """用orjson编码一次后广播，datetime等类型由orjson直接序列化；前端按文本帧解析JSON"""
+        await self.broadcast(orjson.dumps(message, default=_orjson_default).decode(), topic)
+
+    async def broadcast(self, message: str, topic: Optional[str] = None):
+        """广播消息，指定topic时只发给订阅了该主题的连接"""
+        # 先取快照，避免发送过程中连接集合被修改
+        if topic is None:
+            connections = list(self.active_connections)
+        else:
+            connections = [connection for connection, topics in self.subscriptions.items()
+                           if topic in topics]
+
+        for start in range(0, len(connections), self.BROADCAST_BATCH_SIZE):
+            batch = connections[start:start + self.BROADCAST_BATCH_SIZE]
+            results = await asyncio.gather(
+                *(connection.send_text(message) for connection in batch),
+                return_exceptions=True
+            )
+
+            # 发送失败的连接已断开，从集合中移除
+            for connection, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    self.disconnect(connection)
+
+            if start + self.BROADCAST_BATCH_SIZE < len(connections):
+                await asyncio.sleep(0)
 
 manager = ConnectionManager()
 
+@functools.lru_cache(maxsize=1)
+def get_analyzer() -> SystemAnalyzer:
+    """对话和执行结果分析共用的系统分析器，首次使用时创建"""
+    return SystemAnalyzer()
+
+@functools.lru_cache(maxsize=1)
+def get_system_message():
+    """系统提示词消息，内容固定，只构建一次"""
+    return SystemMessage(content=get_analyzer().system_prompt)
+
+class LastExecution:
+    """保存最近一次修复方案的执行结果，读写在事件循环中加锁进行"""
+
+    def __init__(self):
+        self._results: Optional[Dict[str, Any]] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        async with self._lock:
+            return self._results
+
+    async def set(self, results: Dict[str, Any]):
+        async with self._lock:
+            self._results = results
+
+    async def update(self, **fields: Any):
+        """在已有执行结果上补充字段，没有执行结果时忽略"""
+        async with self._lock:
+            if self._results is not None:
+                self._results.update(fields)
+
+last_execution = LastExecution()
+
 # Pydantic模型
 class SystemStatusResponse(BaseModel):
     status: str
@@ -138,15 +331,21 @@ async def root():
         return f.read()
 
 @app.get("/api/status", response_model=SystemStatusResponse)
-async def get_system_status():
-    """获取系统状态"""
+async def get_system_status(request: Request, response: Response):
+    """获取系统状态，支持ETag条件请求"""
     try:
+        etag = state_etag()
+        not_modified = state_not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+
         state = ops_assistant.get_current_state()
 
         # 统计信息
         alerts = state.get('alerts', [])
-        critical_count = len([a for a in alerts if hasattr(a, 'level') and hasattr(a.level, 'value') and a.level.value == 'critical'])
-        warning_count = len([a for a in alerts if hasattr(a, 'level') and hasattr(a.level, 'value') and a.level.value == 'warning'])
+        alert_summary = summarize_alerts(alerts)
 
         # 处理系统状态
         system_status = state.get('system_status')
@@ -165,11 +364,11 @@ async def get_system_status():
         return SystemStatusResponse(
             status=status_value,
             metrics_count=len(state.get('metrics', [])),
-            alerts_count=len(alerts),
+            alerts_count=alert_summary["total"],
             timestamp=datetime.now().isoformat(),
             data={
-                "critical_alerts": critical_count,
-                "warning_alerts": warning_count,
+                "critical_alerts": alert_summary["critical"],
+                "warning_alerts": alert_summary["warning"],
                 "execution_plan_count": len(state.get('execution_plan', [])),
                 "last_check": last_check,
             }
@@ -177,48 +376,28 @@ async def get_system_status():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/metrics", response_model=MetricsResponse)
+# 响应模型只用于接口文档，数据由本服务构造，直接用orjson序列化，跳过Pydantic校验
+@app.get("/api/metrics", responses={200: {"model": MetricsResponse}})
 async def get_metrics():
     """获取监控指标"""
     try:
-        # 获取最新的监控数据
-        prometheus = PrometheusClient()
-        metrics = prometheus.fetch_metrics()
-
-        # 按类型分组并序列化
-        cpu_metrics = [serialize_datetime(m.__dict__) for m in metrics if 'cpu' in m.name.lower()]
-        memory_metrics = [serialize_datetime(m.__dict__) for m in metrics if 'memory' in m.name.lower()]
-        disk_metrics = [serialize_datetime(m.__dict__) for m in metrics if 'disk' in m.name.lower()]
-        network_metrics = [serialize_datetime(m.__dict__) for m in metrics if 'network' in m.name.lower() or 'tcp' in m.name.lower()]
-        system_metrics = [serialize_datetime(m.__dict__) for m in metrics if 'load' in m.name.lower()]
-
-        return MetricsResponse(
-            cpu_metrics=cpu_metrics,
-            memory_metrics=memory_metrics,
-            disk_metrics=disk_metrics,
-            network_metrics=network_metrics,
-            system_metrics=system_metrics,
-            timestamp=datetime.now().isoformat()
+        # 获取监控数据（短时间内复用缓存）
+        metrics = await get_cached_metrics()
+        return AppJSONResponse(
+            build_metrics_payload(metrics),
+            headers={"Cache-Control": f"max-age={Config.METRICS_CACHE_TTL}"}
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/alerts", response_model=AlertResponse)
+@app.get("/api/alerts", responses={200: {"model": AlertResponse}})
 async def get_alerts():
     """获取告警信息"""
     try:
-        prometheus = PrometheusClient()
-        metrics = prometheus.fetch_metrics()
-        alerts = prometheus.detect_alerts(metrics)
-
-        critical_count = len([a for a in alerts if a.level.value == 'critical'])
-        warning_count = len([a for a in alerts if a.level.value == 'warning'])
-
-        return AlertResponse(
-            alerts=[serialize_datetime(alert.__dict__) for alert in alerts],
-            count=len(alerts),
-            critical_count=critical_count,
-            warning_count=warning_count
+        metrics = await get_cached_metrics()
+        return AppJSONResponse(
+            build_alerts_payload(metrics),
+            headers={"Cache-Control": f"max-age={Config.METRICS_CACHE_TTL}"}
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -228,31 +407,29 @@ async def run_system_check(request: CheckRequest):
     """执行系统检查"""
     try:
         # 通过WebSocket广播开始检查的消息
-        await manager.broadcast(json.dumps({
+        await manager.broadcast_json({
             "type": "check_started",
             "message": "开始执行系统检查...",
-            "timestamp": datetime.now().isoformat()
-        }))
+            "timestamp": datetime.now()
+        })
 
         # 执行检查
         result = await ops_assistant.run("执行系统检查")
 
         if result["success"]:
-            # 序列化处理datetime对象
+            # 序列化处理datetime对象（只做一次，state和修复方案复用其结果）
             safe_result = serialize_datetime(result)
+            safe_state = safe_result.get("state", {})
 
-            # 获取修复方案
-            state = result.get("state", {})
-            fix_plans = state.get("fix_plans", [])
-
-            await manager.broadcast(json.dumps({
+            # 编码一次后广播给所有客户端
+            await manager.broadcast_json({
                 "type": "check_completed",
                 "message": "系统检查完成",
                 "data": safe_result,
-                "fix_plans": serialize_datetime(fix_plans),
-                "state": serialize_datetime(state),
-                "timestamp": datetime.now().isoformat()
-            }))
+                "fix_plans": safe_state.get("fix_plans", []),
+                "state": safe_state,
+                "timestamp": datetime.now()
+            })
 
             # 获取状态数据
             state = result.get("state", {})
@@ -273,11 +450,11 @@ async def run_system_check(request: CheckRequest):
             }
         else:
             error_message = result.get('error', '未知错误')
-            await manager.broadcast(json.dumps({
+            await manager.broadcast_json({
                 "type": "check_failed",
                 "message": f"系统检查失败: {error_message}",
-                "timestamp": datetime.now().isoformat()
-            }))
+                "timestamp": datetime.now()
+            })
 
             return {
                 "success": False,
@@ -287,11 +464,11 @@ async def run_system_check(request: CheckRequest):
 
     except Exception as e:
         error_msg = f"检查过程中发生错误: {str(e)}"
-        await manager.broadcast(json.dumps({
+        await manager.broadcast_json({
             "type": "check_error",
             "message": error_msg,
-            "timestamp": datetime.now().isoformat()
-        }))
+            "timestamp": datetime.now()
+        })
 
         return {
             "success": False,
@@ -299,18 +476,49 @@ async def run_system_check(request: CheckRequest):
             "error": error_msg
         }
 
+async def stream_command(executor: RemoteExecutor, command: str, timeout: int = 30,
+                         **extra: Any):
+    """在线程中执行命令，同时把输出分块通过WebSocket实时推送"""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def on_output(stream: str, chunk: str):
+        # 在执行线程中回调，交给事件循环按顺序推送
+        loop.call_soon_threadsafe(queue.put_nowait, (stream, chunk))
+
+    async def pump():
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            stream, chunk = item
+            await manager.broadcast_json({
+                "type": "cmd_output",
+                "command": command,
+                "stream": stream,
+                "chunk": chunk,
+                **extra
+            })
+
+    pump_task = asyncio.create_task(pump())
+    try:
+        return await asyncio.to_thread(executor.execute_command, command, timeout, on_output)
+    finally:
+        queue.put_nowait(None)
+        await pump_task
+
 @app.post("/api/execute")
 async def execute_command(request: ExecuteCommandRequest):
     """执行远程命令"""
     try:
-        with RemoteExecutor() as executor:
-            result = executor.execute_command(request.command)
-            return {
-                "success": result.success,
-                "output": result.output,
-                "error": result.error,
-                "execution_time": result.execution_time
-            }
+        async with executor_pool.acquire() as executor:
+            result = await stream_command(executor, request.command)
+        return {
+            "success": result.success,
+            "output": result.output,
+            "error": result.error,
+            "execution_time": result.execution_time
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -344,9 +552,6 @@ async def chat_with_ai(request: ChatRequest):
 如果用户询问具体指标，请提供当前数据和分析。
 """
 
-        # 使用系统分析器处理对话
-        analyzer = SystemAnalyzer()
-
         try:
             # 构建对话提示
             chat_prompt = f"""
@@ -357,15 +562,14 @@ async def chat_with_ai(request: ChatRequest):
 请提供专业、准确、有用的回答。如果是技术问题，请提供具体的操作建议。
 """
 
-            # 调用LLM生成回复
-            from langchain_core.messages import HumanMessage, SystemMessage
+            # 调用LLM生成回复，使用异步接口避免阻塞事件循环
 
             messages = [
-                SystemMessage(content=analyzer.system_prompt),
+                get_system_message(),
                 HumanMessage(content=chat_prompt)
             ]
 
-            response = analyzer.llm.invoke(messages)
+            response = await get_analyzer().llm.ainvoke(messages)
             ai_response = response.content
 
             # 保存对话历史
@@ -379,26 +583,13 @@ async def chat_with_ai(request: ChatRequest):
 
         except Exception as llm_error:
             # 如果LLM调用失败，提供预设的智能回复
-            predefined_responses = {
-                'status': f'当前系统状态为: {system_status}。系统中监测到{metrics_count}个性能指标和{alerts_count}个活跃告警。',
-                'check': '如需执行系统检查，请点击控制台页面中的"执行系统检查"按钮。这会触发AI分析系统状态并生成修复方案。',
-                'cpu': f'当前监控到{metrics_count}个系统指标。请查看监控指标页面获取详细的CPU使用率数据，包括实时使用情况、系统负载等信息。',
-                'memory': '内存使用情况请查看监控指标页面。如果内存使用率过高，建议检查内存占用高的进程，考虑清理系统缓存或重启相关服务。',
-                'disk': '磁盘使用情况请查看监控指标页面。建议定期清理临时文件、日志文件和不需要的数据，确保有足够的磁盘空间。',
-                'alerts': f'当前系统有{alerts_count}个活跃告警。请查看告警管理页面了解详细信息，并根据AI建议采取相应措施。',
-                'optimize': '系统优化建议：1) 监控CPU和内存使用率，避免资源瓶颈 2) 定期清理临时文件和日志 3) 及时更新系统补丁 4) 优化数据库查询 5) 监控网络连接数',
-                'default': '我建议您查看系统控制台了解当前状态，或者询问具体的技术问题，如CPU使用率、内存情况、磁盘空间等。我会根据实时数据提供专业的建议。'
-            }
-
-            # 根据用户问题类型匹配预设回复
-            response_text = predefined_responses.get('default', predefined_responses['status'])
-
-            # 检查消息关键词
-            message_lower = message.lower()
-            for key, response in predefined_responses.items():
-                if key != 'default' and key in message_lower:
-                    response_text = response
-                    break
+            match = _CHAT_KEYWORDS_RE.search(message)
+            key = match.group(1).lower() if match else 'default'
+            response_text = _PREDEFINED_CHAT_RESPONSES[key].format(
+                system_status=system_status,
+                metrics_count=metrics_count,
+                alerts_count=alerts_count
+            )
 
             return {
                 "success": True,
@@ -414,66 +605,125 @@ async def chat_with_ai(request: ChatRequest):
         }
 
 @app.get("/api/config")
-async def get_config():
-    """获取配置信息"""
-    try:
-        return {
-            "server_host": Config.SERVER_HOST,
-            "prometheus_url": Config.PROMETHEUS_URL,
-            "llm_model": Config.LLM_MODEL,
-            "thresholds": Config.THRESHOLDS
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def get_config(request: Request):
+    """获取配置信息，支持ETag条件请求"""
+    if request.headers.get("if-none-match") == _CONFIG_ETAG:
+        return Response(status_code=304, headers=_CONFIG_HEADERS)
+    return Response(content=_CONFIG_BODY, media_type="application/json", headers=_CONFIG_HEADERS)
 
 @app.get("/api/history")
-async def get_history():
-    """获取操作历史"""
+async def get_history(request: Request):
+    """获取操作历史，支持ETag条件请求"""
     try:
+        etag = state_etag()
+        not_modified = state_not_modified(request, etag)
+        if not_modified:
+            return not_modified
+
         state = ops_assistant.get_current_state()
-        return {
-            "action_history": serialize_datetime(state.get('action_history', [])),
-            "conversation_history": serialize_datetime(state.get('conversation_history', []))
-        }
+        return AppJSONResponse({
+            "action_history": state.get('action_history', []),
+            "conversation_history": state.get('conversation_history', [])
+        }, headers={"ETag": etag, "Cache-Control": "no-cache"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/fix-plans")
-async def get_fix_plans():
-    """获取修复方案"""
+async def get_fix_plans(request: Request):
+    """获取修复方案，支持ETag条件请求"""
     try:
+        # 状态未变化时只返回304，不再序列化和传输响应体
+        etag = state_etag()
+        not_modified = state_not_modified(request, etag)
+        if not_modified:
+            return not_modified
+
         state = ops_assistant.get_current_state()
         fix_plans = state.get('fix_plans', [])
 
-        return {
+        return AppJSONResponse({
             "success": True,
-            "fix_plans": serialize_datetime(fix_plans),
+            "fix_plans": fix_plans,
             "count": len(fix_plans),
             "timestamp": datetime.now().isoformat()
-        }
+        }, headers={"ETag": etag, "Cache-Control": "no-cache"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def group_plan_commands(commands: List[Dict[str, Any]]) -> List[List[tuple]]:
+    """按parallel_group把相邻命令分组，未指定分组的命令单独成组"""
+    groups = []
+    last_group_id = None
+    for step, cmd in enumerate(commands, 1):
+        if not cmd.get('command'):
+            continue
+        group_id = cmd.get('parallel_group')
+        if group_id is not None and group_id == last_group_id:
+            groups[-1].append((step, cmd))
+        else:
+            groups.append([(step, cmd)])
+        last_group_id = group_id
+    return groups
+
+async def _execute_plan_command(executor: RemoteExecutor, semaphore: asyncio.Semaphore,
+                                plan_id: str, step: int, total: int,
+                                cmd: Dict[str, Any]) -> Dict[str, Any]:
+    """执行修复方案中的单条命令，完成后广播进度"""
+    command_str = cmd.get('command', '')
+    timeout = cmd.get('timeout', 30)
+    logger.info(f"执行命令 {step}/{total}: {command_str}")
+
+    try:
+        async with semaphore:
+            result = await stream_command(executor, command_str, timeout, plan_id=plan_id, step=step)
+
+        execution_result = {
+            "step": step,
+            "command": command_str,
+            "success": result.success,
+            "output": result.output,
+            "error": result.error,
+            "execution_time": result.execution_time,
+            # 执行器已记录完成时间，直接复用
+            "timestamp": result.timestamp.isoformat()
+        }
+
+        if not result.success:
+            logger.warning(f"命令执行失败: {command_str}, 错误: {result.error}")
+
+    except Exception as e:
+        logger.error(f"命令执行异常: {command_str}, 异常: {e}")
+        execution_result = {
+            "step": step,
+            "command": command_str,
+            "success": False,
+            "output": "",
+            "error": str(e),
+            "execution_time": 0,
+            "timestamp": datetime.now().isoformat()
+        }
+
+    await manager.broadcast_json({
+        "type": "command_completed",
+        "plan_id": plan_id,
+        "step": step,
+        "total": total,
+        "success": execution_result["success"],
+        "timestamp": execution_result["timestamp"]
+    })
+    return execution_result
+
 @app.post("/api/fix-plans/approve")
 async def approve_fix_plan(request: FixPlanRequest):
     """批准并执行修复方案"""
-    global last_execution_results
     try:
         plan_id = request.plan_id
         logger.info(f"用户批准修复方案: {plan_id}")
 
-        # 获取当前状态和修复方案
-        state = ops_assistant.get_current_state()
-        fix_plans = state.get('fix_plans', [])
-
-        # 查找指定的修复方案
-        selected_plan = None
-
-        # 首先从状态管理器中查找
-        for plan in fix_plans:
-            if plan.get('id') == plan_id:
-                selected_plan = plan
-                break
+        # 通过状态管理器维护的索引按id查找修复方案
+        state_manager = ops_assistant.state_manager
+        fix_plans = state_manager.state.get('fix_plans', [])
+        selected_plan = state_manager.plan_index.by_id.get(plan_id)
 
         # 如果没找到，尝试索引方式
         if not selected_plan:
@@ -484,51 +734,14 @@ async def approve_fix_plan(request: FixPlanRequest):
             except (ValueError, IndexError):
                 pass
 
-        # 如果是followup_plan类型，从多个来源中获取
-        if not selected_plan and ('followup_plan' in plan_id or 'followup' in plan_id):
-            # 尝试从状态管理器中获取最新方案
-            current_fix_plans = ops_assistant.state_manager.state.get('fix_plans', [])
-            for plan in current_fix_plans:
-                if plan.get('id') == plan_id:
-                    selected_plan = plan
-                    break
-
-            # 如果没找到，尝试从全局last_execution_results中获取
-            if not selected_plan:
-                if last_execution_results:
-                    # 检查new_fix_plans
-                    if 'new_fix_plans' in last_execution_results:
-                        new_fix_plans = last_execution_results['new_fix_plans']
-                        for plan in new_fix_plans:
-                            if plan.get('id') == plan_id:
-                                selected_plan = plan
-                                break
-
-                    # 检查analysis结果
-                    if not selected_plan and 'analysis' in last_execution_results:
-                        analysis = last_execution_results['analysis']
-                        if analysis.get('fix_plans'):
-                            analysis_fix_plans = analysis['fix_plans']
-                            for plan in analysis_fix_plans:
-                                if plan.get('id') == plan_id:
-                                    selected_plan = plan
-                                    break
-
-            # 如果还是没找到，尝试模糊匹配followup相关方案
-            if not selected_plan:
-                for plan in current_fix_plans:
-                    if ((plan.get('id') and ('followup' in str(plan.get('id')).lower() or 'followup_plan' in str(plan.get('id')).lower())) or
-                       (plan.get('issue') and 'followup' in str(plan.get('issue')).lower())):
-                        selected_plan = plan
-                        break
-
-        # 如果还是没找到，尝试模糊匹配
-        if not selected_plan:
-            for plan in fix_plans:
-                if (plan.get('id') and plan_id in str(plan.get('id'))) or \
-                   (plan.get('issue') and plan_id in str(plan.get('issue'))):
-                    selected_plan = plan
-                    break
+        # 如果是followup类型，再从最近一次执行结果中获取
+        last_results = await last_execution.get() if not selected_plan and 'followup' in plan_id else None
+        if last_results:
+            # new_fix_plans放在后面，同id时优先于分析结果中的方案
+            analysis = last_results.get('analysis') or {}
+            candidate_plans = list(analysis.get('fix_plans') or [])
+            candidate_plans.extend(last_results.get('new_fix_plans') or [])
+            selected_plan = PlanIndex.build(candidate_plans).by_id.get(plan_id)
 
         logger.info(f"找到修复方案: {selected_plan is not None}")
 
@@ -539,73 +752,42 @@ async def approve_fix_plan(request: FixPlanRequest):
             }
 
         # 通过WebSocket广播执行开始的消息
-        await manager.broadcast(json.dumps({
+        await manager.broadcast_json({
             "type": "execution_started",
             "message": "开始执行修复方案...",
             "plan_id": plan_id,
-            "timestamp": datetime.now().isoformat()
-        }))
+            "timestamp": datetime.now()
+        })
 
         # 执行修复方案
         execution_results = []
         total_success = True
-        start_time = datetime.now()
+        start_time = time.perf_counter()
 
         # 获取修复计划中的命令
         commands = selected_plan.get('commands', [])
 
         if commands:
-            with RemoteExecutor() as executor:
-                for i, cmd in enumerate(commands):
-                    command_str = cmd.get('command', '')
-                    timeout = cmd.get('timeout', 30)
-
-                    if not command_str:
-                        continue
-
-                    logger.info(f"执行命令 {i+1}/{len(commands)}: {command_str}")
-
-                    try:
-                        # 执行命令
-                        result = executor.execute_command(command_str, timeout=timeout)
-
-                        execution_result = {
-                            "step": i + 1,
-                            "command": command_str,
-                            "success": result.success,
-                            "output": result.output,
-                            "error": result.error,
-                            "execution_time": result.execution_time,
-                            "timestamp": datetime.now().isoformat()
-                        }
-
+            # SSH连接和命令执行都是阻塞操作，放到线程中执行，避免阻塞事件循环
+            semaphore = asyncio.Semaphore(Config.MAX_PARALLEL_COMMANDS)
+            async with executor_pool.acquire() as executor:
+                for group in group_plan_commands(commands):
+                    # 同一并行组内的命令并发执行，结果按原步骤顺序追加
+                    group_results = await asyncio.gather(*(
+                        _execute_plan_command(executor, semaphore, plan_id, step, len(commands), cmd)
+                        for step, cmd in group
+                    ))
+                    for execution_result in group_results:
                         execution_results.append(execution_result)
-
-                        if not result.success:
+                        if not execution_result["success"]:
                             total_success = False
-                            logger.warning(f"命令执行失败: {command_str}, 错误: {result.error}")
-
-                    except Exception as e:
-                        logger.error(f"命令执行异常: {command_str}, 异常: {e}")
-                        execution_result = {
-                            "step": i + 1,
-                            "command": command_str,
-                            "success": False,
-                            "output": "",
-                            "error": str(e),
-                            "execution_time": 0,
-                            "timestamp": datetime.now().isoformat()
-                        }
-                        execution_results.append(execution_result)
-                        total_success = False
 
         # 计算总执行时间
-        end_time = datetime.now()
-        total_time = (end_time - start_time).total_seconds()
+        total_time = time.perf_counter() - start_time
+        finished_at = datetime.now()
 
         # 更新状态管理器
         for exec_result in execution_results:
-            from states import ExecutionResult
             result_obj = ExecutionResult(
                 command=exec_result['command'],
                 success=exec_result['success'],
@@ -623,20 +805,20 @@ async def approve_fix_plan(request: FixPlanRequest):
             "success": total_success,
             "total_time": total_time,
             "commands": execution_results,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": finished_at.isoformat()
         }
 
-        # 保存执行结果到全局变量，供前端查询
-        last_execution_results = result_data
+        # 保存执行结果，供前端查询
+        await last_execution.set(result_data)
 
         # 通过WebSocket广播执行完成的消息
-        await manager.broadcast(json.dumps({
+        await manager.broadcast_json({
             "type": "execution_completed",
             "message": "修复方案执行完成",
             "plan_id": plan_id,
             "success": total_success,
-            "timestamp": datetime.now().isoformat()
-        }))
+            "timestamp": finished_at
+        })
 
         return {
             "success": True,
@@ -646,12 +828,12 @@ async def approve_fix_plan(request: FixPlanRequest):
 
     except Exception as e:
         logger.error(f"执行修复方案失败: {e}")
-        await manager.broadcast(json.dumps({
+        await manager.broadcast_json({
             "type": "execution_failed",
             "message": f"修复方案执行失败: {str(e)}",
             "plan_id": plan_id,
-            "timestamp": datetime.now().isoformat()
-        }))
+            "timestamp": datetime.now()
+        })
 
         return {
             "success": False,
@@ -688,8 +870,6 @@ async def reject_fix_plan(request: FixPlanRequest):
 async def get_execution_results(plan_id: str = None):
     """获取执行结果"""
     try:
-        global last_execution_results
-
         if plan_id and hasattr(ops_assistant.state_manager, 'execution_results'):
             # 从状态管理器获取结果
             execution_results = ops_assistant.state_manager.state.get('execution_results', [])
@@ -718,11 +898,12 @@ async def get_execution_results(plan_id: str = None):
                     }
                 }
 
-        # 如果有全局的执行结果，返回它
-        if 'last_execution_results' in globals():
+        # 如果有最近一次的执行结果，返回它
+        last_results = await last_execution.get()
+        if last_results is not None:
             return {
                 "success": True,
-                "results": globals()['last_execution_results']
+                "results": last_results
             }
 
         # 没有执行结果
@@ -756,8 +937,7 @@ async def analyze_execution_results(request: ExecutionAnalysisRequest):
             "detailed_results": execution_results.get('commands', [])
         }
 
-        # 使用系统分析器进行AI分析
-        analyzer = SystemAnalyzer()
+        analyzer = get_analyzer()
 
         # 构建执行结果分析提示
         analysis_prompt = f"""
@@ -831,15 +1011,14 @@ async def analyze_execution_results(request: ExecutionAnalysisRequest):
 - 如果没有找到需要处理的进程，请在fix_plans中提供空数组
 """
 
-        # 调用LLM进行分析
-        from langchain_core.messages import HumanMessage, SystemMessage
+        # 调用LLM进行分析，使用异步接口避免阻塞事件循环
 
         messages = [
-            SystemMessage(content=analyzer.system_prompt),
+            get_system_message(),
             HumanMessage(content=analysis_prompt)
         ]
 
-        response = analyzer.llm.invoke(messages)
+        response = await analyzer.llm.ainvoke(messages)
         analysis_text = response.content
 
         # 解析分析结果
@@ -869,10 +1048,8 @@ async def save_fix_plans(request: SaveFixPlansRequest):
         # 保存到状态管理器
         ops_assistant.state_manager.set_fix_plans(fix_plans)
 
-        # 保存到全局变量
-        global last_execution_results
-        if last_execution_results:
-            last_execution_results['new_fix_plans'] = fix_plans
+        # 同步到最近一次执行结果
+        await last_execution.update(new_fix_plans=fix_plans)
 
         logger.info(f"保存了 {len(fix_plans)} 个修复方案到状态管理器")
 
@@ -907,36 +1084,16 @@ async def edit_command(request: CommandEditRequest):
                 "message": "命令包含不安全的内容，请检查后重试"
             }
 
-        # 获取当前状态和修复方案
-        state = ops_assistant.get_current_state()
-        fix_plans = state.get('fix_plans', [])
-
-        # 查找指定的修复方案
-        selected_plan = None
-        plan_index = None
-
-        for i, plan in enumerate(fix_plans):
-            if plan.get('id') == plan_id or f"plan_{i+1}" == plan_id:
-                selected_plan = plan
-                plan_index = i
-                break
-
-        if not selected_plan:
-            # 如果没找到，尝试从其他数据源查找
-            current_fix_plans = ops_assistant.state_manager.state.get('fix_plans', [])
-            for i, plan in enumerate(current_fix_plans):
-                if plan.get('id') == plan_id or f"plan_{i+1}" == plan_id:
-                    selected_plan = plan
-                    plan_index = i
-                    fix_plans = current_fix_plans
-                    break
-
-        if not selected_plan or plan_index is None:
+        # 通过状态管理器的方案索引查找指定的修复方案
+        fix_plans = ops_assistant.state_manager.state.get('fix_plans', [])
+        entry = ops_assistant.state_manager.get_plan_by_id(plan_id)
+        if entry is None:
             return {
                 "success": False,
                 "error": "方案未找到",
                 "message": f"未找到修复方案: {plan_id}"
             }
+        plan_index, selected_plan = entry
 
         # 检查命令索引
         commands = selected_plan.get('commands', [])
@@ -947,14 +1104,17 @@ async def edit_command(request: CommandEditRequest):
                 "message": f"无效的命令索引: {command_index}"
             }
 
+        cmd = commands[command_index]
+
         # 保存原始命令（如果尚未保存）
-        if not commands[command_index].get('original_command'):
-            commands[command_index]['original_command'] = commands[command_index]['command']
+        if not cmd.get('original_command'):
+            cmd['original_command'] = cmd['command']
 
         # 更新命令
-        commands[command_index]['command'] = new_command
-        commands[command_index]['user_modified'] = True
-        commands[command_index]['modified_at'] = datetime.now().isoformat()
+        now_iso = datetime.now().isoformat()
+        cmd['command'] = new_command
+        cmd['user_modified'] = True
+        cmd['modified_at'] = now_iso
 
         # 更新状态
         fix_plans[plan_index]['commands'] = commands
@@ -964,9 +1124,9 @@ async def edit_command(request: CommandEditRequest):
         ops_assistant.state_manager.add_action("edit_command", {
             "plan_id": plan_id,
             "command_index": command_index,
-            "original_command": request.original_command or commands[command_index]['original_command'],
+            "original_command": request.original_command or cmd['original_command'],
             "new_command": new_command,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso
         })
 
         logger.info(f"成功编辑命令: {plan_id}[{command_index}]")
@@ -987,59 +1147,58 @@ async def edit_command(request: CommandEditRequest):
             "message": f"编辑命令时发生错误: {str(e)}"
         }
 
+# 危险命令模式
+_DANGEROUS_PATTERNS = (
+    r'rm\s+-rf\s+/',  # rm -rf /
+    r'dd\s+if=',      # dd命令（可能破坏磁盘）
+    r'mkfs\.',        # 文件系统格式化
+    r'format',        # 格式化命令
+    r'shutdown\s+-h', # 关机命令
+    r'reboot',        # 重启命令
+    r'halt',          # 停机命令
+    r'poweroff',      # 关机命令
+    r'>\s*/dev/sda',  # 直接写入硬盘
+    r'dd\s+if.*of.*/dev/sd', # 直接写入硬盘分区
+    r'curl.*\|\s*sh', # 下载并执行脚本
+    r'wget.*\|\s*bash', # 下载并执行脚本
+    r'eval\s*\(',     # eval函数
+    r'exec\s*\(',     # exec函数
+    r'system\s*\(',   # system函数
+    r'chmod\s+777\s+/', # 危险的权限设置
+    r'chmod\s+777\s+\*', # 危险的权限设置
+    r'chown\s+-R\s+root\s+/', # 危险的所有权变更
+    r':\(\)\{\.*\;\}\s*\/dev\/null&', # fork炸弹模式
+    r'sudo\s+rm\s+-rf\s+/', # 危险的sudo删除
+    r'su\s+root\s+-c\s*rm', # 危险的root删除
+)
+# 合并为一个忽略大小写的正则，一次扫描完成全部模式匹配
+_DANGEROUS_RE = re.compile("|".join(f"(?:{pattern})" for pattern in _DANGEROUS_PATTERNS), re.IGNORECASE)
+
+# 可疑的字符组合，按字面量合并为一个正则
+_SUSPICIOUS_CHARS = ('&& rm -rf', '; rm -rf', '| rm -rf', '`rm -rf`', '$(rm -rf)')
+_SUSPICIOUS_RE = re.compile("|".join(re.escape(chars) for chars in _SUSPICIOUS_CHARS), re.IGNORECASE)
+
 def _validate_command_security(command: str) -> bool:
     """验证命令安全性"""
     if not command or len(command.strip()) == 0:
         return False
 
-    # 导入正则表达式
-    import re
-
-    # 转换为小写进行检查
-    lower_command = command.lower()
-
-    # 危险命令模式
-    dangerous_patterns = [
-        r'rm\s+-rf\s+/',  # rm -rf /
-        r'dd\s+if=',      # dd命令（可能破坏磁盘）
-        r'mkfs\.',        # 文件系统格式化
-        r'format',        # 格式化命令
-        r'shutdown\s+-h', # 关机命令
-        r'reboot',        # 重启命令
-        r'halt',          # 停机命令
-        r'poweroff',      # 关机命令
-        r'>\s*/dev/sda',  # 直接写入硬盘
-        r'dd\s+if.*of.*/dev/sd', # 直接写入硬盘分区
-        r'curl.*\|\s*sh', # 下载并执行脚本
-        r'wget.*\|\s*bash', # 下载并执行脚本
-        r'eval\s*\(',     # eval函数
-        r'exec\s*\(',     # exec函数
-        r'system\s*\(',   # system函数
-        r'chmod\s+777\s+/', # 危险的权限设置
-        r'chmod\s+777\s+\*', # 危险的权限设置
-        r'chown\s+-R\s+root\s+/', # 危险的所有权变更
-        r':\(\)\{\.*\;\}\s*\/dev\/null&', # fork炸弹模式
-        r'sudo\s+rm\s+-rf\s+/', # 危险的sudo删除
-        r'su\s+root\s+-c\s*rm', # 危险的root删除
-    ]
-
     # 检查危险模式
-    for pattern in dangerous_patterns:
-        if re.search(pattern, lower_command):
-            logger.warning(f"检测到危险命令模式: {pattern} in {command}")
-            return False
+    match = _DANGEROUS_RE.search(command)
+    if match:
+        logger.warning(f"检测到危险命令模式: {match.group(0)} in {command}")
+        return False
 
     # 检查是否包含可疑的字符组合
-    suspicious_chars = ['&& rm -rf', '; rm -rf', '| rm -rf', '`rm -rf`', '$(rm -rf)']
-    for suspicious in suspicious_chars:
-        if suspicious in lower_command:
-            logger.warning(f"检测到可疑字符组合: {suspicious}")
-            return False
+    match = _SUSPICIOUS_RE.search(command)
+    if match:
+        logger.warning(f"检测到可疑字符组合: {match.group(0)}")
+        return False
 
     return True
 
-# 全局变量存储最后执行结果
-last_execution_results = None
+# 心跳回复内容固定，预先序列化
+_PONG = orjson.dumps({"type": "pong"}).decode()
 
 # WebSocket端点
 @app.websocket("/ws")
@@ -1050,23 +1209,59 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             data = await websocket.receive_text()
             # 这里可以处理前端发送的消息
-            message = json.loads(data)
+            message = orjson.loads(data)
 
             if message.get("type") == "ping":
-                await websocket.send_text(json.dumps({"type": "pong"}))
+                await websocket.send_text(_PONG)
+            elif message.get("type") == "subscribe":
+                manager.subscribe(websocket, message.get("topics", []))
 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
+async def push_metrics_loop():
+    """定时向订阅的客户端推送监控指标和告警，所有客户端共用一次Prometheus查询"""
+    while True:
+        try:
+            push_metrics = manager.has_subscribers("metrics")
+            push_alerts = manager.has_subscribers("alerts")
+            if push_metrics or push_alerts:
+                metrics = await get_cached_metrics()
+                if push_metrics:
+                    await manager.broadcast_json(
+                        {"type": "metrics_tick", "data": build_metrics_payload(metrics)}, topic="metrics")
+                if push_alerts:
+                    await manager.broadcast_json(
+                        {"type": "alerts_tick", "data": build_alerts_payload(metrics)}, topic="alerts")
+        except Exception as e:
+            logger.error(f"推送监控数据失败: {e}")
+
+        await asyncio.sleep(Config.METRICS_PUSH_INTERVAL)
+
+# 后台推送任务
+_push_task: Optional[asyncio.Task] = None
+
 # 启动事件
 @app.on_event("startup")
 async def startup_event():
     """应用启动事件"""
+    global _push_task
+    _push_task = asyncio.create_task(push_metrics_loop())
     print("[STARTUP] 智能运维助手Web服务启动成功!")
     print(f"[MONITOR] 监控目标: {Config.SERVER_HOST}")
     print(f"[PROMETHEUS] Prometheus: {Config.PROMETHEUS_URL}")
     print(f"[AI] AI模型: {Config.LLM_MODEL}")
 
+# 关闭事件
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭事件"""
+    if _push_task:
+        _push_task.cancel()
+    logger.info("SSH连接池统计: 命中 %d 次, 新建 %d 次",
+                executor_pool.pool_hit_total, executor_pool.pool_miss_total)
+    await asyncio.to_thread(executor_pool.close_all)
+
 if __name__ == "__main__":
     uvicorn.run(
         "web_app:app",
@@ -12,6 +12,8 @@ class Config:
     DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY")
     LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
     LLM_MODEL = os.getenv("LLM_MODEL", "qwen-max")
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # 同时进行的LLM请求上限
+    LLM_RATE_PER_SEC = float(os.getenv("LLM_RATE_PER_SEC", "0"))  # 每秒LLM请求数上限，0表示不限制
 
     # 数据库配置
     DB_HOST = os.getenv("DB_HOST", "localhost")
@@ -33,6 +35,12 @@ class Config:
     MAX_RETRIES = 3
     TIMEOUT = 30
     LOG_LEVEL = "INFO"
+    # 是否逐个记录LangGraph节点执行和状态转换（写入节点/转换日志文件），设为0可关闭
+    LANGGRAPH_NODE_TRACE = os.getenv("LANGGRAPH_NODE_TRACE", "1") == "1"
+
+    # 指标缓存配置
+    METRICS_SOFT_TTL = 60   # 缓存超过该时间(秒)仍可使用，但会触发后台刷新
+    METRICS_HARD_TTL = 300  # 缓存超过该时间(秒)失效，需等待重新采集
 
     # 监控指标阈值
     THRESHOLDS = {
@@ -4,10 +4,11 @@
 实现React机制，根据用户需求决定是否执行系统巡检
 """
 
+import functools
 import re
 import time
-from typing import Dict, Any, Optional, List, Tuple
-from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Pattern, Tuple
+from dataclasses import dataclass, asdict
 from enum import Enum
 
 from logger_config import get_logger
@@ -15,6 +16,50 @@ from langgraph_logger import langgraph_logger
 
 logger = get_logger(__name__)
 
+# 意图分析缓存的最大条目数，以及参与缓存的最长问题长度
+INTENT_CACHE_SIZE = 1024
+INTENT_CACHE_MAX_QUERY_LEN = 256
+
+# 含有这些字符的模式按正则处理，其余视为纯文本关键词
+_REGEX_METACHARS = frozenset("*.+?[](){}\\")
+
+def _is_literal(pattern: str) -> bool:
+    """模式是否为纯文本关键词"""
+    return not _REGEX_METACHARS.intersection(pattern)
+
+def _keyword_pattern(keyword: str) -> str:
+    """英文关键词要求前后不是字母数字（避免"this"命中"hi"），中文关键词仍按子串匹配"""
+    escaped = re.escape(keyword)
+    if keyword.isascii() and keyword.isalnum():
+        return f"(?<![A-Za-z0-9]){escaped}(?![A-Za-z0-9])"
+    return escaped
+
+def _compile_keywords(keywords: List[str], word_boundary: bool = False) -> Optional[Pattern]:
+    """把一组关键词编译为一个忽略大小写的多关键词匹配正则，较长的关键词优先"""
+    if not keywords:
+        return None
+    to_pattern = _keyword_pattern if word_boundary else re.escape
+    return re.compile("|".join(map(to_pattern, sorted(keywords, key=len, reverse=True))), re.IGNORECASE)
+
+def _first_listed_keyword(pattern: Optional[Pattern], keywords: List[str], text: str) -> Optional[str]:
+    """返回文本中出现的关键词里在列表中最靠前的一个，与按列表顺序逐个判断的结果一致"""
+    match = pattern.search(text) if pattern else None
+    if not match:
+        return None
+    rank = {keyword.lower(): i for i, keyword in enumerate(keywords)}
+    best = len(keywords)
+    # 逐个位置向后查找，重叠出现的关键词也能找到
+    while match and best:
+        best = min(best, rank.get(match.group(0).lower(), best))
+        match = pattern.search(text, match.start() + 1)
+    return keywords[best]
+
+def _compile_patterns(patterns: List[str]) -> Optional[Pattern]:
+    """把一组正则模式合并为一个忽略大小写的正则，一次扫描判断是否有任一模式命中"""
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+
 class IntentType(Enum):
     """用户意图类型"""
     CHAT = "chat"                    # 纯对话，直接LLM回答
@@ -25,9 +70,9 @@ class IntentType(Enum):
     PERFORMANCE = "performance"      # 性能分析
     OPTIMIZATION = "optimization"    # 系统优化
 
-@dataclass
+@dataclass(frozen=True)
 class IntentAnalysis:
-    """意图分析结果"""
+    """意图分析结果（缓存结果会被多次复用，因此不可变）"""
     intent_type: IntentType
     confidence: float
     requires_metrics: bool
@@ -35,6 +80,12 @@ class IntentAnalysis:
     extracted_params: Dict[str, Any]
     reasoning: str
 
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可JSON序列化的字典"""
+        data = asdict(self)
+        data["intent_type"] = self.intent_type.value
+        return data
+
 class ConversationRouter:
     """对话路由器 - 分析用户意图并决定处理流程"""
 
@@ -42,7 +93,7 @@ class ConversationRouter:
         self.logger = get_logger("conversation_router")
 
         # 意图识别关键词和模式
-        self.intent_patterns = {
+        raw_intent_patterns = {
             IntentType.SYSTEM_CHECK: [
                 r"检查系统", r"系统检查", r"巡检", r"健康检查", r"状态检查",
                 r"体检", r"诊断", r"全面检查", r"监控检查", r"全面.*检查"
@@ -78,48 +129,86 @@ class ConversationRouter:
             ]
         }
 
+        # 每类意图的纯文本关键词合并成一个正则，一次扫描即可判断是否命中；
+        # 其余正则模式也按意图合并为一个正则
+        # 重复的关键词只保留在最先出现的意图中：靠前的意图命中即得满分，后面的同名关键词不会生效
+        self._literal_patterns = {}
+        seen_literals = set()
+        for intent_type, patterns in raw_intent_patterns.items():
+            literals = [p for p in patterns if _is_literal(p) and p not in seen_literals]
+            seen_literals.update(literals)
+            self._literal_patterns[intent_type] = _compile_keywords(literals)
+        self.intent_patterns = {
+            intent_type: _compile_patterns([p for p in patterns if not _is_literal(p)])
+            for intent_type, patterns in raw_intent_patterns.items()
+        }
+
         # 强制系统检查的关键词
         self.force_check_keywords = [
             "检查系统", "系统检查", "巡检", "全面检查", "健康检查", "状态检查"
         ]
+        self._force_check_re = _compile_keywords(self.force_check_keywords, word_boundary=True)
+
+        # 简单聊天关键词
+        self.chat_keywords = ["你好", "hello", "hi", "谢谢", "再见", "帮助", "介绍"]
+        self._chat_keywords_re = _compile_keywords(self.chat_keywords, word_boundary=True)
+
+        # 故障描述提取模式
+        self._error_patterns = [
+            re.compile(r"(错误|异常|失败)([:：]\s*)(.+)"),
+            re.compile(r"(问题|故障)([:：]\s*)(.+)"),
+            re.compile(r"(不能|无法|失败)([:：]\s*)(.+)")
+        ]
+
+        # 相同问题的意图分析结果缓存
+        self._cached_analyze = functools.lru_cache(maxsize=INTENT_CACHE_SIZE)(self.analyze_intent)
+
+    def analyze_intent_cached(self, user_query: str, context: Optional[Dict[str, Any]] = None) -> IntentAnalysis:
+        """分析用户意图，重复的问题直接复用缓存结果；过长的问题不缓存"""
+        query = user_query.strip()
+        if len(query) > INTENT_CACHE_MAX_QUERY_LEN:
+            return self.analyze_intent(query, context)
+        # 意图分析只依赖问题文本，不读取上下文，缓存键无需包含上下文
+        return self._cached_analyze(query)
 
     def analyze_intent(self, user_query: str, context: Optional[Dict[str, Any]] = None) -> IntentAnalysis:
         """分析用户意图"""
-        query_lower = user_query.lower()
-
         # 记录意图分析开始
         self.logger.info(f"开始分析用户意图: {user_query[:100]}...")
 
         # 检查是否强制要求系统检查
-        for keyword in self.force_check_keywords:
-            if keyword in query_lower:
-                return IntentAnalysis(
-                    intent_type=IntentType.SYSTEM_CHECK,
-                    confidence=0.95,
-                    requires_metrics=True,
-                    requires_execution=False,
-                    extracted_params={"force_check": True},
-                    reasoning=f"检测到强制检查关键词: {keyword}"
-                )
+        # 所有模式均忽略大小写编译，无需先把整个问题转为小写
+        keyword = _first_listed_keyword(self._force_check_re, self.force_check_keywords, user_query)
+        if keyword:
+            return IntentAnalysis(
+                intent_type=IntentType.SYSTEM_CHECK,
+                confidence=0.95,
+                requires_metrics=True,
+                requires_execution=False,
+                extracted_params={"force_check": True},
+                reasoning=f"检测到强制检查关键词: {keyword}"
+            )
 
         # 优先检查简单聊天意图（高优先级）
-        chat_keywords = ["你好", "hello", "hi", "谢谢", "再见", "帮助", "介绍"]
-        for keyword in chat_keywords:
-            if keyword in query_lower:
-                return IntentAnalysis(
-                    intent_type=IntentType.CHAT,
-                    confidence=0.98,
-                    requires_metrics=False,
-                    requires_execution=False,
-                    extracted_params={"greeting": keyword},
-                    reasoning=f"检测到聊天关键词: {keyword}"
-                )
-
-        # 计算各种意图的匹配度
+        # 同时出现多个聊天关键词时，取列表中最靠前的一个
+        greeting = _first_listed_keyword(self._chat_keywords_re, self.chat_keywords, user_query)
+        if greeting:
+            return IntentAnalysis(
+                intent_type=IntentType.CHAT,
+                confidence=0.98,
+                requires_metrics=False,
+                requires_execution=False,
+                extracted_params={"greeting": greeting},
+                reasoning=f"检测到聊天关键词: {greeting}"
+            )
+
+        # 按顺序计算各种意图的匹配度，满分即可停止；同分时仍取靠前的意图
         intent_scores = {}
-        for intent_type, patterns in self.intent_patterns.items():
-            score = self._calculate_pattern_score(query_lower, patterns)
+        for intent_type in self.intent_patterns:
+            score = self._calculate_pattern_score(user_query, intent_type)
             intent_scores[intent_type] = score
+            if score >= 1.0:
+                break
 
         # 找到最高分的意图
         best_intent = max(intent_scores, key=intent_scores.get)
@@ -180,23 +269,18 @@ class ConversationRouter:
 
         return result
 
-    def _calculate_pattern_score(self, query: str, patterns: List[str]) -> float:
+    def _calculate_pattern_score(self, query: str, intent_type: IntentType) -> float:
         """计算模式匹配分数"""
-        max_score = 0.0
-        for pattern in patterns:
-            # 尝试正则匹配
-            if re.search(pattern, query):
-                # 如果是简单的文本匹配（不是正则），精确匹配得分更高
-                if not any(char in pattern for char in r"*.+?[](){}\\") and pattern in query:
-                    score = 1.0
-                else:
-                    score = 0.8
-                max_score = max(max_score, score)
-            # 如果正则匹配失败，尝试简单的文本包含匹配
-            elif pattern in query:
-                score = 0.9  # 文本包含匹配得分较高
-                max_score = max(max_score, score)
-        return max_score
+        # 纯文本关键词精确匹配得分最高，命中即可返回
+        literal_re = self._literal_patterns[intent_type]
+        if literal_re and literal_re.search(query):
+            return 1.0
+
+        # 其余正则模式合并为一个正则，任一命中即得分
+        pattern_re = self.intent_patterns[intent_type]
+        if pattern_re and pattern_re.search(query):
+            return 0.8
+        return 0.0
 
     def _extract_parameters(self, query: str, intent_type: IntentType) -> Dict[str, Any]:
         """从查询中提取参数"""
@@ -217,22 +301,17 @@ class ConversationRouter:
                 "load": "系统负载"
             }
 
+            query_lower = query.lower()
             for key, value in resource_types.items():
-                if key in query.lower():
+                if key in query_lower:
                     params["resource_type"] = key
                     params["resource_name"] = value
                     break
 
         elif intent_type == IntentType.TROUBLESHOOT:
             # 提取问题描述
-            error_patterns = [
-                r"(错误|异常|失败)([:：]\s*)(.+)",
-                r"(问题|故障)([:：]\s*)(.+)",
-                r"(不能|无法|失败)([:：]\s*)(.+)"
-            ]
-
-            for pattern in error_patterns:
-                match = re.search(pattern, query)
+            for pattern in self._error_patterns:
+                match = pattern.search(query)
                 if match:
                     params["error_description"] = match.group(3).strip()
                     break
@@ -6,28 +6,74 @@
 """
 
 import os
+import hashlib
 import logging
-from typing import List
+import threading
+from collections import OrderedDict
+from typing import Callable, List
+from chromadb.utils import embedding_functions
 from langchain_core.embeddings import Embeddings
 from logger_config import get_logger
 
 logger = get_logger(__name__)
 
+# ChromaDB默认嵌入函数，构造时会加载ONNX模型，整个进程只创建一次
+_default_embedding_function = None
+
+def _get_default_embedding_function():
+    """获取共享的ChromaDB默认嵌入函数，首次调用时创建"""
+    global _default_embedding_function
+    if _default_embedding_function is None:
+        _default_embedding_function = embedding_functions.DefaultEmbeddingFunction()
+    return _default_embedding_function
+
+# 查询向量缓存的最大条目数
+QUERY_CACHE_SIZE = 512
+# 本地模型批量编码时每批的文本数
+EMBED_BATCH_SIZE = 64
+
+class QueryEmbeddingCache:
+    """查询向量LRU缓存，以文本摘要为键，相同查询直接复用已计算的向量"""
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, text: str, compute: Callable[[str], List[float]]) -> List[float]:
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                logger.debug(f"查询向量缓存命中 (命中: {self.hits}, 未命中: {self.misses})")
+                return list(cached)
+
+        embedding = compute(text)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = tuple(embedding)
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        logger.debug(f"查询向量缓存未命中 (命中: {self.hits}, 未命中: {self.misses})")
+        return embedding
+
 class ChromaDefaultEmbeddings(Embeddings):
     """ChromaDB默认嵌入模型 - 384维"""
 
     def __init__(self):
         """初始化ChromaDB默认嵌入模型"""
+        self._query_cache = QueryEmbeddingCache()
         logger.info("使用ChromaDB默认384维嵌入模型")
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """嵌入文档文本"""
-        import chromadb.utils.embedding_functions as embedding_functions
-
         try:
             # 使用ChromaDB的默认嵌入函数
-            embedding_func = embedding_functions.DefaultEmbeddingFunction()
-            embeddings = embedding_func(texts)
+            embeddings = _get_default_embedding_function()(texts)
             logger.info(f"成功嵌入 {len(texts)} 个文档，向量维度: {len(embeddings[0])}")
             return embeddings
         except Exception as e:
@@ -35,12 +81,13 @@ class ChromaDefaultEmbeddings(Embeddings):
             raise
 
     def embed_query(self, text: str) -> List[float]:
-        """嵌入查询文本"""
-        import chromadb.utils.embedding_functions as embedding_functions
+        """嵌入查询文本，重复查询使用缓存"""
+        return self._query_cache.get_or_compute(text, self._embed_query)
 
+    def _embed_query(self, text: str) -> List[float]:
+        """计算查询向量"""
         try:
-            embedding_func = embedding_functions.DefaultEmbeddingFunction()
-            embedding = embedding_func([text])
+            embedding = _get_default_embedding_function()([text])
             logger.info(f"成功嵌入查询，向量维度: {len(embedding[0])}")
             return embedding[0]
         except Exception as e:
@@ -52,18 +99,32 @@ class LocalEmbeddings(Embeddings):
 
     def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
         self.model_name = model_name
+        self._model = None
+        self._query_cache = QueryEmbeddingCache()
         logger.info(f"初始化本地嵌入模型: {model_name}")
 
-    def _get_sentence_transformer_embedding(self, texts: List[str]) -> List[List[float]]:
-        """使用sentence-transformers获取嵌入"""
-        try:
+    def _get_model(self):
+        """首次使用时加载模型并复用，设备由sentence-transformers自动选择（有GPU时使用cuda）"""
+        if self._model is None:
             from sentence_transformers import SentenceTransformer
 
-            model = SentenceTransformer(self.model_name)
-            embeddings = model.encode(texts, convert_to_numpy=False)
+            self._model = SentenceTransformer(self.model_name)
+            logger.info(f"本地嵌入模型加载完成: {self.model_name}, 设备: {self._model.device}")
+        return self._model
 
-            # 确保返回List[List[float]]格式
-            result = [embedding.tolist() for embedding in embeddings]
+    def _get_sentence_transformer_embedding(self, texts: List[str]) -> List[List[float]]:
+        """使用sentence-transformers获取嵌入"""
+        try:
+            model = self._get_model()
+            embeddings = model.encode(
+                texts,
+                batch_size=EMBED_BATCH_SIZE,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+
+            # 整个二维数组一次转换为List[List[float]]
+            result = embeddings.tolist()
             logger.info(f"成功嵌入 {len(texts)} 个文档，向量维度: {len(result[0])}")
             return result
 
@@ -79,9 +140,10 @@ class LocalEmbeddings(Embeddings):
         return self._get_sentence_transformer_embedding(texts)
 
     def embed_query(self, text: str) -> List[float]:
-        """嵌入查询文本"""
-        result = self._get_sentence_transformer_embedding([text])
-        return result[0]
+        """嵌入查询文本，重复查询使用缓存"""
+        return self._query_cache.get_or_compute(
+            text, lambda query: self._get_sentence_transformer_embedding([query])[0]
+        )
 
 # 测试函数
 def test_embeddings():
@@ -4,14 +4,18 @@ LangGraph过程日志记录模块
 专门用于记录LangGraph工作流中的用户交互、AI回复和节点执行过程
 """
 
-import json
+import asyncio
+import functools
+import logging
 import hashlib
 import time
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Union
 from dataclasses import dataclass, asdict
 from pathlib import Path
+import orjson
 
+from config import Config
 from logger_config import get_logger, log_operation, log_performance, ErrorTracker
 
 
@@ -60,6 +64,10 @@ class StateTransitionLog:
     state_snapshot: Dict[str, Any]
 
 
+def _dumps_line(obj: Any) -> bytes:
+    """序列化为一行JSON；枚举、日期和数据类由orjson直接处理，其余对象转为字符串"""
+    return orjson.dumps(obj, default=str, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS)
+
 class LangGraphLogger:
     """LangGraph专用日志记录器"""
 
@@ -115,9 +123,10 @@ class LangGraphLogger:
         state["_log_start_time"] = start_time
         state["_log_node_name"] = node_name
 
-        # 记录状态快照（简化版本，避免过大）
-        state_snapshot = self._create_state_snapshot(state)
-        self.logger.debug(f"节点 {node_name} 输入状态快照: {json.dumps(state_snapshot, ensure_ascii=False)[:500]}")
+        # 记录状态快照（简化版本，避免过大），仅在DEBUG级别开启时才生成
+        if self.logger.isEnabledFor(logging.DEBUG):
+            state_snapshot = self._create_state_snapshot(state)
+            self.logger.debug(f"节点 {node_name} 输入状态快照: {orjson.dumps(state_snapshot, default=str).decode()[:500]}")
 
     def log_node_end(self, node_name: str, input_state: Dict[str, Any], output_state: Dict[str, Any],
                     success: bool = True, error_message: str = None, metadata: Dict[str, Any] = None):
@@ -329,8 +338,8 @@ class LangGraphLogger:
                     context_data['system_status'] = str(context_data['system_status'])
                 log_dict['context_data'] = context_data
 
-            log_entry = f"{json.dumps(log_dict, ensure_ascii=False)}\n"
-            with open(self.conversation_log_file, 'a', encoding='utf-8') as f:
+            log_entry = _dumps_line(log_dict)
+            with open(self.conversation_log_file, 'ab') as f:
                 f.write(log_entry)
         except Exception as e:
             self.logger.error(f"写入对话日志失败: {e}")
@@ -338,8 +347,8 @@ class LangGraphLogger:
     def _write_node_log(self, log: NodeExecutionLog):
         """写入节点执行日志到文件"""
         try:
-            log_entry = f"{json.dumps(asdict(log), ensure_ascii=False)}\n"
-            with open(self.node_execution_log_file, 'a', encoding='utf-8') as f:
+            log_entry = _dumps_line(log)
+            with open(self.node_execution_log_file, 'ab') as f:
                 f.write(log_entry)
         except Exception as e:
             self.logger.error(f"写入节点日志失败: {e}")
@@ -347,8 +356,8 @@ class LangGraphLogger:
     def _write_transition_log(self, log: StateTransitionLog):
         """写入状态转换日志到文件"""
         try:
-            log_entry = f"{json.dumps(asdict(log), ensure_ascii=False)}\n"
-            with open(self.state_transition_log_file, 'a', encoding='utf-8') as f:
+            log_entry = _dumps_line(log)
+            with open(self.state_transition_log_file, 'ab') as f:
                 f.write(log_entry)
         except Exception as e:
             self.logger.error(f"写入转换日志失败: {e}")
@@ -359,8 +368,12 @@ langgraph_logger = LangGraphLogger()
 
 
 def log_langgraph_node(node_name: str):
-    """LangGraph节点装饰器，自动记录节点执行"""
+    """LangGraph节点装饰器，自动记录节点执行；关闭节点追踪时直接返回原函数"""
     def decorator(func):
+        if not Config.LANGGRAPH_NODE_TRACE:
+            return func
+
+        @functools.wraps(func)
         async def async_wrapper(self, state, *args, **kwargs):
             # 记录节点开始
             langgraph_logger.log_node_start(node_name, state)
@@ -383,6 +396,7 @@ def log_langgraph_node(node_name: str):
                 )
                 raise
 
+        @functools.wraps(func)
         def sync_wrapper(self, state, *args, **kwargs):
             # 记录节点开始
             langgraph_logger.log_node_start(node_name, state)
@@ -406,7 +420,6 @@ def log_langgraph_node(node_name: str):
                 raise
 
         # 根据函数类型返回相应的包装器
-        import asyncio
         if asyncio.iscoroutinefunction(func):
             return async_wrapper
         else:
@@ -416,8 +429,12 @@ def log_langgraph_node(node_name: str):
 
 
 def log_langgraph_transition(from_node: str, condition: str = "default"):
-    """记录状态转换的装饰器"""
+    """记录状态转换的装饰器；关闭节点追踪时直接返回原函数"""
     def decorator(func):
+        if not Config.LANGGRAPH_NODE_TRACE:
+            return func
+
+        @functools.wraps(func)
         def wrapper(self, state, *args, **kwargs):
             # 执行条件判断函数
             result = func(self, state, *args, **kwargs)
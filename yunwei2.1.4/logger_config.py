@@ -6,6 +6,8 @@
 
 import os
 import sys
+import atexit
+import queue
 import logging
 import logging.handlers
 import traceback
@@ -32,6 +34,64 @@ class LoggerSetup:
         # 日志级别
         self.log_level = getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO)
 
+        # 创建格式器
+        self.formatter = logging.Formatter(
+            fmt='%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+
+        # 所有logger共用一组文件处理器和一个后台写入线程，日志文件的写入和轮转只在该线程中进行
+        self.log_queue = queue.SimpleQueue()
+        self.listener = logging.handlers.QueueListener(
+            self.log_queue, *self._create_file_handlers(), respect_handler_level=True
+        )
+        self.listener.start()
+        atexit.register(self.stop_listener)
+
+    def _create_file_handlers(self) -> list:
+        """创建应用、错误和调试日志的文件处理器"""
+        # 应用日志文件处理器
+        app_handler = logging.handlers.RotatingFileHandler(
+            self.app_log_file,
+            maxBytes=10*1024*1024,  # 10MB
+            backupCount=5,
+            encoding='utf-8'
+        )
+        app_handler.setLevel(logging.INFO)
+        app_handler.setFormatter(self.formatter)
+        file_handlers = [app_handler]
+
+        # 错误日志文件处理器
+        error_handler = logging.handlers.RotatingFileHandler(
+            self.error_log_file,
+            maxBytes=10*1024*1024,  # 10MB
+            backupCount=5,
+            encoding='utf-8'
+        )
+        error_handler.setLevel(logging.ERROR)
+        error_handler.setFormatter(self.formatter)
+        file_handlers.append(error_handler)
+
+        # 调试日志文件处理器（仅在DEBUG模式下）
+        if self.log_level <= logging.DEBUG:
+            debug_handler = logging.handlers.RotatingFileHandler(
+                self.debug_log_file,
+                maxBytes=10*1024*1024,  # 10MB
+                backupCount=3,
+                encoding='utf-8'
+            )
+            debug_handler.setLevel(logging.DEBUG)
+            debug_handler.setFormatter(self.formatter)
+            file_handlers.append(debug_handler)
+
+        return file_handlers
+
+    def stop_listener(self):
+        """停止后台写入线程，确保队列中的日志全部落盘"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
     def setup_logger(self, name: str = __name__) -> logging.Logger:
         """设置并返回配置好的logger"""
         logger = logging.getLogger(name)
@@ -42,12 +102,6 @@ class LoggerSetup:
 
         logger.setLevel(self.log_level)
 
-        # 创建格式器
-        formatter = logging.Formatter(
-            fmt='%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-
         # 控制台处理器 - 修复编码问题
         class UTF8ConsoleHandler(logging.StreamHandler):
             """处理UTF-8编码的控制台处理器"""
@@ -101,42 +155,11 @@ class LoggerSetup:
 
         console_handler = UTF8ConsoleHandler()
         console_handler.setLevel(self.log_level)
-        console_handler.setFormatter(formatter)
+        console_handler.setFormatter(self.formatter)
         logger.addHandler(console_handler)
 
-        # 应用日志文件处理器
-        app_handler = logging.handlers.RotatingFileHandler(
-            self.app_log_file,
-            maxBytes=10*1024*1024,  # 10MB
-            backupCount=5,
-            encoding='utf-8'
-        )
-        app_handler.setLevel(logging.INFO)
-        app_handler.setFormatter(formatter)
-        logger.addHandler(app_handler)
-
-        # 错误日志文件处理器
-        error_handler = logging.handlers.RotatingFileHandler(
-            self.error_log_file,
-            maxBytes=10*1024*1024,  # 10MB
-            backupCount=5,
-            encoding='utf-8'
-        )
-        error_handler.setLevel(logging.ERROR)
-        error_handler.setFormatter(formatter)
-        logger.addHandler(error_handler)
-
-        # 调试日志文件处理器（仅在DEBUG模式下）
-        if self.log_level <= logging.DEBUG:
-            debug_handler = logging.handlers.RotatingFileHandler(
-                self.debug_log_file,
-                maxBytes=10*1024*1024,  # 10MB
-                backupCount=3,
-                encoding='utf-8'
-            )
-            debug_handler.setLevel(logging.DEBUG)
-            debug_handler.setFormatter(formatter)
-            logger.addHandler(debug_handler)
+        # 文件日志经共享队列交给后台线程写入，调用方（包括事件循环）不阻塞在磁盘IO上
+        logger.addHandler(logging.handlers.QueueHandler(self.log_queue))
 
         return logger
 
@@ -305,6 +328,8 @@ def log_performance(func_name: str,
                    details: dict = None):
     """记录性能日志"""
     logger = get_logger()
+    if not logger.isEnabledFor(logging.INFO):
+        return
     duration = end_time - start_time
 
     perf_info = {
@@ -4,6 +4,8 @@ React机制的聊天API
 替换原有的聊天API，使用智能路由和React工作流
 """
 
+import asyncio
+import time
 from datetime import datetime
 from typing import Dict, Any, Optional
 from fastapi import HTTPException
@@ -30,11 +32,13 @@ class ReactChatHandler:
     @async_error_logger(context="React聊天API")
     async def handle_chat(self, message: str, use_knowledge_base: bool = False) -> Dict[str, Any]:
         """处理聊天请求"""
-        import time
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         try:
-            if not message.strip():
+            # 去除首尾空白后的消息只计算一次，后续复用
+            msg = message.strip()
+            msg_len = len(msg)
+            if not msg:
                 return {
                     "success": False,
                     "response": "请输入你的问题"
@@ -42,27 +46,28 @@ class ReactChatHandler:
 
             # 记录用户查询
             log_operation("用户发送React聊天消息", {
-                "message_length": len(message),
-                "message_preview": message[:50] + "..." if len(message) > 50 else message,
+                "message_length": msg_len,
+                "message_preview": msg[:50] + "..." if msg_len > 50 else msg,
                 "use_knowledge_base": use_knowledge_base
             }, user="web_client")
 
             # 如果启用知识库检索，使用RAG引擎
             if use_knowledge_base:
-                log_operation("使用RAG引擎处理消息", {"message": message[:100]}, user="web_client")
+                log_operation("使用RAG引擎处理消息", {"message": msg[:100]}, user="web_client")
 
-                # 使用RAG引擎处理消息
-                rag_result = self.rag_engine.process_message(
-                    message=message.strip(),
+                # 使用RAG引擎处理消息，同步的检索和生成放到线程中执行，避免阻塞事件循环
+                rag_result = await asyncio.to_thread(
+                    self.rag_engine.process_message,
+                    message=msg,
                     force_rag=True
                 )
 
                 if rag_result["success"]:
                     # 记录性能
-                    end_time = time.time()
+                    end_time = time.perf_counter()
                     processing_time = end_time - start_time
                     log_performance("rag_chat_api", start_time, end_time, {
-                        "message_length": len(message),
+                        "message_length": msg_len,
                         "response_length": len(rag_result.get("answer", "")),
                         "context_used": rag_result.get("context_used", False),
                         "retrieval_results": rag_result.get("retrieval_results", 0)
@@ -94,14 +99,14 @@ class ReactChatHandler:
                     }, level="warning", user="web_client")
 
             # 使用React智能运维助手处理请求
-            result = await self.ops_assistant.run(message.strip())
+            result = await self.ops_assistant.run(msg)
 
             if result["success"]:
                 # 记录性能和操作完成
-                end_time = time.time()
+                end_time = time.perf_counter()
                 processing_time = end_time - start_time
                 log_performance("react_chat_api", start_time, end_time, {
-                    "message_length": len(message),
+                    "message_length": msg_len,
                     "response_length": len(result.get("response", "")),
                     "workflow_type": result.get("workflow_type", "unknown"),
                     "response_type": result.get("response_type", "unknown")
@@ -132,6 +137,7 @@ class ReactChatHandler:
                 }
             else:
                 # 处理失败情况
+                processing_time = time.perf_counter() - start_time
                 log_operation("React聊天失败", {
                     "error": result.get("error", "未知错误"),
                     "processing_time": f"{processing_time:.2f}s"
@@ -149,7 +155,7 @@ class ReactChatHandler:
                 }
 
         except Exception as e:
-            end_time = time.time()
+            end_time = time.perf_counter()
             processing_time = end_time - start_time
 
             log_operation("React聊天API异常", {
@@ -5,24 +5,119 @@
 """
 
 import asyncio
+import hashlib
+import itertools
 import time
-from typing import Dict, List, Any, Optional
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from enum import Enum
 
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.messages import HumanMessage, SystemMessage
 
+from config import Config
 from states import OpsAssistantState, StateManager, SystemStatus
 from monitoring import PrometheusClient
 from remote_executor import RemoteExecutor
 from analyzer import SystemAnalyzer
-from conversation_router import conversation_router, IntentType
+from conversation_router import conversation_router, IntentAnalysis, IntentType
 from logger_config import get_logger, error_logger, log_operation, log_performance
 from langgraph_logger import langgraph_logger, log_langgraph_node, log_langgraph_transition
 
 logger = get_logger(__name__)
 
+# LLM提示词模板，静态部分只构建一次
+_CHAT_PROMPT_TEMPLATE = """
+你是一个专业的Linux系统运维助手。请基于以下信息回答用户问题：
+
+{chat_context}
+
+用户问题：{user_query}
+
+请提供专业、准确、有用的回答。如果是技术问题，请提供具体的操作建议。
+如果用户询问系统状态，请基于当前提供的数据进行分析。
+如果需要执行系统检查，请指导用户点击"执行系统检查"按钮。
+"""
+
+_ANALYSIS_PROMPT_TEMPLATE = """
+请分析以下系统问题：
+
+用户描述: {user_query}
+提取的参数: {extracted_params}
+
+当前系统状态:
+- 监控指标数量: {metrics_count}
+- 活跃告警数量: {alerts_count}
+
+请分析可能的问题原因并提供初步的诊断结果。
+"""
+
+_SOLUTION_PROMPT_TEMPLATE = """
+基于以下问题分析，请提供详细的解决方案：
+
+用户问题: {user_query}
+问题分析: {problem_analysis}
+
+请提供：
+1. 问题的根本原因
+2. 具体的解决步骤
+3. 预防措施
+4. 如果需要，相关的命令示例
+"""
+
+# 相同对话提示词的LLM回复缓存条数和有效期(秒)
+LLM_RESPONSE_CACHE_SIZE = 512
+LLM_RESPONSE_CACHE_TTL = 60
+
+# 采集指标后发生变化的状态字段
+_METRICS_STATE_KEYS = ("metrics", "alerts", "system_status", "timestamp", "action_history")
+
+# 报告中指标状态和告警级别对应的图标
+_STATUS_ICON = {"normal": "✅", "warning": "⚠️", "critical": "❌"}
+_ALERT_LEVEL_ICON = {"critical": "🔴", "warning": "🟡"}
+
+_ANALYSIS_SYSTEM_MESSAGE = SystemMessage(content="你是一个专业的系统故障诊断专家。")
+_SOLUTION_SYSTEM_MESSAGE = SystemMessage(content="你是一个专业的系统问题解决专家。")
+
+# 缺少意图分析结果时使用的默认聊天意图
+_DEFAULT_CHAT_INTENT = IntentAnalysis(
+    intent_type=IntentType.CHAT,
+    confidence=0.5,
+    requires_metrics=False,
+    requires_execution=False,
+    extracted_params={},
+    reasoning="默认聊天意图"
+)
+
+class _TokenBucket:
+    """令牌桶限流器，rate不大于0时不限流"""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """取得一个令牌，令牌不足时等待补充"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+# 进程内所有LLM调用共用的并发和速率限制，避免并发请求过多触发服务端限流
+_llm_semaphore = asyncio.Semaphore(Config.LLM_MAX_CONCURRENCY)
+_llm_rate_limiter = _TokenBucket(Config.LLM_RATE_PER_SEC)
+
 class WorkflowType(Enum):
     """工作流类型"""
     CHAT = "chat"
@@ -40,6 +135,9 @@ class ReactOpsAssistantGraph:
         self.remote_executor = RemoteExecutor()
         self.logger = get_logger("react_ops_graph")
 
+        # 对话使用的系统提示词消息，内容固定，只构建一次
+        self._chat_system_message = SystemMessage(content=self.system_analyzer.system_prompt)
+
         # 构建多个工作流
         self.graphs = {
             WorkflowType.CHAT: self._build_chat_graph(),
@@ -48,9 +146,15 @@ class ReactOpsAssistantGraph:
             WorkflowType.TROUBLESHOOT: self._build_troubleshoot_graph()
         }
 
-        # 缓存的指标数据
+        # 缓存的指标数据，超过软过期时间后先返回旧数据并在后台刷新
         self._cached_metrics = None
         self._metrics_cache_time = 0
+        self._metrics_refresh_task: Optional[asyncio.Task] = None
+        self._metrics_cache_stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+
+        # 对话回复缓存：提示词摘要 -> (回复, 写入时间)；相同提示词的并发请求共用一次LLM调用
+        self._llm_cache: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._llm_inflight: Dict[bytes, asyncio.Task] = {}
 
     def _build_chat_graph(self) -> StateGraph:
         """构建对话工作流"""
@@ -69,9 +173,8 @@ class ReactOpsAssistantGraph:
         workflow.add_edge("chat_response", "end_conversation")
         workflow.add_edge("end_conversation", END)
 
-        # 创建checkpointer
-        checkpointer = MemorySaver()
-        return workflow.compile(checkpointer=checkpointer)
+        # 每次运行都由StateManager提供完整初始状态，不需要checkpointer保存中间状态
+        return workflow.compile()
 
     def _build_system_check_graph(self) -> StateGraph:
         """构建系统检查工作流（完整的巡检流程）"""
@@ -121,9 +224,8 @@ class ReactOpsAssistantGraph:
         workflow.add_edge("handle_errors", "report_results")
         workflow.add_edge("report_results", END)
 
-        # 创建checkpointer
-        checkpointer = MemorySaver()
-        return workflow.compile(checkpointer=checkpointer)
+        # 每次运行都由StateManager提供完整初始状态，不需要checkpointer保存中间状态
+        return workflow.compile()
 
     def _build_system_info_graph(self) -> StateGraph:
         """构建系统信息查询工作流（简化版检查）"""
@@ -140,9 +242,8 @@ class ReactOpsAssistantGraph:
         workflow.add_edge("collect_basic_metrics", "provide_system_info")
         workflow.add_edge("provide_system_info", END)
 
-        # 创建checkpointer
-        checkpointer = MemorySaver()
-        return workflow.compile(checkpointer=checkpointer)
+        # 每次运行都由StateManager提供完整初始状态，不需要checkpointer保存中间状态
+        return workflow.compile()
 
     def _build_troubleshoot_graph(self) -> StateGraph:
         """构建故障排查工作流"""
@@ -161,29 +262,28 @@ class ReactOpsAssistantGraph:
         workflow.add_edge("analyze_problem", "provide_solution")
         workflow.add_edge("provide_solution", END)
 
-        # 创建checkpointer
-        checkpointer = MemorySaver()
-        return workflow.compile(checkpointer=checkpointer)
+        # 每次运行都由StateManager提供完整初始状态，不需要checkpointer保存中间状态
+        return workflow.compile()
 
     # ==================== 节点实现 ====================
 
     @log_langgraph_node("route_intent")
     async def _route_intent(self, state: OpsAssistantState) -> OpsAssistantState:
         """路由用户意图"""
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         try:
             user_query = state.get("user_query", "")
 
             # 分析用户意图
-            intent_analysis = conversation_router.analyze_intent(user_query, state.get("context", {}))
+            intent_analysis = conversation_router.analyze_intent_cached(user_query, state.get("context", {}))
 
             # 存储意图分析结果
             state["intent_analysis"] = intent_analysis
             state["workflow_type"] = intent_analysis.intent_type.value
 
             # 记录性能
-            end_time = time.time()
+            end_time = time.perf_counter()
             log_performance("route_intent", start_time, end_time, {
                 "intent_type": intent_analysis.intent_type.value,
                 "confidence": intent_analysis.confidence
@@ -201,7 +301,7 @@ class ReactOpsAssistantGraph:
     @log_langgraph_node("chat_response")
     async def _chat_response(self, state: OpsAssistantState) -> OpsAssistantState:
         """生成对话响应（不执行系统检查）"""
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         try:
             user_query = state.get("user_query", "")
@@ -209,32 +309,12 @@ class ReactOpsAssistantGraph:
 
             # 生成聊天上下文
             current_metrics = self._get_cached_metrics() if intent_analysis and intent_analysis.requires_metrics else None
-            # 确保传递有效的意图分析对象
-            if not intent_analysis:
-                # 如果意图分析为空，创建一个默认的聊天意图
-                from conversation_router import IntentAnalysis, IntentType
-                intent_analysis = IntentAnalysis(
-                    intent_type=IntentType.CHAT,
-                    confidence=0.5,
-                    requires_metrics=False,
-                    requires_execution=False,
-                    extracted_params={},
-                    reasoning="默认聊天意图"
-                )
+            # 确保传递有效的意图分析对象，为空时使用默认的聊天意图
+            intent_analysis = intent_analysis or _DEFAULT_CHAT_INTENT
             chat_context = conversation_router.generate_chat_context(intent_analysis, current_metrics)
 
             # 构建对话提示
-            chat_prompt = f"""
-你是一个专业的Linux系统运维助手。请基于以下信息回答用户问题：
-
-{chat_context}
-
-用户问题：{user_query}
-
-请提供专业、准确、有用的回答。如果是技术问题，请提供具体的操作建议。
-如果用户询问系统状态，请基于当前提供的数据进行分析。
-如果需要执行系统检查，请指导用户点击"执行系统检查"按钮。
-"""
+            chat_prompt = _CHAT_PROMPT_TEMPLATE.format(chat_context=chat_context, user_query=user_query)
 
             # 记录LLM交互开始
             langgraph_logger.log_llm_interaction(
@@ -245,17 +325,14 @@ class ReactOpsAssistantGraph:
             )
 
             # 调用LLM生成回复
-            from langchain_core.messages import HumanMessage, SystemMessage
-
             messages = [
-                SystemMessage(content=self.system_analyzer.system_prompt),
+                self._chat_system_message,
                 HumanMessage(content=chat_prompt)
             ]
 
-            llm_start_time = time.time()
-            response = self.system_analyzer.llm.invoke(messages)
-            llm_end_time = time.time()
-            ai_response = response.content
+            llm_start_time = time.perf_counter()
+            ai_response = await self._cached_chat_completion(chat_prompt, messages)
+            llm_end_time = time.perf_counter()
 
             # 记录LLM交互完成
             langgraph_logger.log_llm_interaction(
@@ -271,7 +348,7 @@ class ReactOpsAssistantGraph:
             state["response_type"] = "chat"
 
             # 记录性能
-            end_time = time.time()
+            end_time = time.perf_counter()
             log_performance("chat_response", start_time, end_time, {
                 "response_length": len(ai_response),
                 "llm_response_time": llm_end_time - llm_start_time
@@ -293,6 +370,7 @@ class ReactOpsAssistantGraph:
             # 记录对话完成
             user_query = state.get("user_query", "")
             ai_response = state.get("ai_response", "")
+            intent_analysis = state.get("intent_analysis")
 
             langgraph_logger.log_conversation(
                 user_query=user_query,
@@ -303,7 +381,7 @@ class ReactOpsAssistantGraph:
                 context_data={
                     "workflow_type": state.get("workflow_type"),
                     "response_type": state.get("response_type"),
-                    "intent_analysis": state.get("intent_analysis").__dict__ if state.get("intent_analysis") else None
+                    "intent_analysis": intent_analysis.to_dict() if intent_analysis else None
                 }
             )
 
@@ -321,24 +399,14 @@ class ReactOpsAssistantGraph:
         try:
             logger.info("开始收集监控指标...")
 
-            # 获取Prometheus指标
-            metrics = self.prometheus_client.fetch_metrics()
-
-            # 检测告警
-            alerts = self.prometheus_client.detect_alerts(metrics)
+            # 获取Prometheus指标并检测告警，结果同时写入缓存
+            snapshot = await self._fetch_metrics()
+            metrics = snapshot["metrics"]
+            alerts = snapshot["alerts"]
 
             # 更新状态
             self.state_manager.update_metrics(metrics)
-            for alert in alerts:
-                self.state_manager.add_alert(alert)
-
-            # 缓存指标数据
-            self._cached_metrics = {
-                "metrics": metrics,
-                "alerts": alerts,
-                "timestamp": time.time()
-            }
-            self._metrics_cache_time = time.time()
+            self.state_manager.add_alerts(alerts)
 
             # 记录操作
             self.state_manager.add_action("collect_metrics", {
@@ -348,7 +416,7 @@ class ReactOpsAssistantGraph:
             })
 
             logger.info(f"收集到 {len(metrics)} 个指标，{len(alerts)} 个告警")
-            return self.state_manager.get_state()
+            return self.state_manager.get_updates(*_METRICS_STATE_KEYS)
 
         except Exception as e:
             logger.error(f"收集监控指标失败: {e}")
@@ -364,9 +432,8 @@ class ReactOpsAssistantGraph:
             if cached_data:
                 logger.info("使用缓存的指标数据")
                 self.state_manager.update_metrics(cached_data["metrics"])
-                for alert in cached_data["alerts"]:
-                    self.state_manager.add_alert(alert)
-                return self.state_manager.get_state()
+                self.state_manager.add_alerts(cached_data["alerts"])
+                return self.state_manager.get_updates(*_METRICS_STATE_KEYS)
 
             # 如果没有缓存，则收集新指标
             return await self._collect_metrics(state)
@@ -420,7 +487,7 @@ class ReactOpsAssistantGraph:
             alerts = state.get("alerts", [])
 
             # 使用LLM分析问题
-            problem_analysis = self._analyze_problem_with_llm(user_query, intent_analysis, metrics, alerts)
+            problem_analysis = await self._analyze_problem_with_llm(user_query, intent_analysis, metrics, alerts)
 
             state["problem_analysis"] = problem_analysis
             return state
@@ -438,7 +505,7 @@ class ReactOpsAssistantGraph:
             problem_analysis = state.get("problem_analysis", "")
 
             # 生成解决方案
-            solution_response = self._generate_solution_response(user_query, problem_analysis)
+            solution_response = await self._generate_solution_response(user_query, problem_analysis)
 
             state["ai_response"] = solution_response
             state["response_type"] = "solution"
@@ -452,100 +519,153 @@ class ReactOpsAssistantGraph:
 
     # ==================== 辅助方法 ====================
 
+    async def _invoke_llm(self, messages: List) -> Any:
+        """调用LLM，受全局并发数和速率限制"""
+        async with _llm_semaphore:
+            await _llm_rate_limiter.acquire()
+            return await self.system_analyzer.llm.ainvoke(messages)
+
+    async def _cached_chat_completion(self, chat_prompt: str, messages: List) -> str:
+        """生成对话回复，相同提示词在有效期内直接复用缓存的回复"""
+        key = hashlib.blake2b(chat_prompt.encode("utf-8"), digest_size=16).digest()
+        cached = self._llm_cache.get(key)
+        if cached and time.monotonic() - cached[1] < LLM_RESPONSE_CACHE_TTL:
+            self._llm_cache.move_to_end(key)
+            return cached[0]
+
+        # 相同提示词已有请求在进行时等待其结果，不重复调用LLM
+        task = self._llm_inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._invoke_llm(messages))
+            self._llm_inflight[key] = task
+            task.add_done_callback(lambda _: self._llm_inflight.pop(key, None))
+        response = await asyncio.shield(task)
+
+        self._llm_cache[key] = (response.content, time.monotonic())
+        self._llm_cache.move_to_end(key)
+        while len(self._llm_cache) > LLM_RESPONSE_CACHE_SIZE:
+            self._llm_cache.popitem(last=False)
+        return response.content
+
     def _get_cached_metrics(self) -> Optional[Dict[str, Any]]:
-        """获取缓存的指标数据"""
+        """获取缓存的指标数据，超过软过期时间时返回旧数据并在后台刷新"""
         if self._cached_metrics and self._metrics_cache_time:
             age = time.time() - self._metrics_cache_time
-            if age < 300:  # 5分钟缓存
+            if age < Config.METRICS_SOFT_TTL:
+                self._metrics_cache_stats["hits"] += 1
                 return self._cached_metrics
+            if age < Config.METRICS_HARD_TTL:
+                self._metrics_cache_stats["stale_hits"] += 1
+                self._start_metrics_refresh(background=True)
+                return self._cached_metrics
+        self._metrics_cache_stats["misses"] += 1
         return None
 
+    def _start_metrics_refresh(self, background: bool = False) -> asyncio.Task:
+        """启动指标采集任务，已有采集任务在进行时直接复用；后台启动的采集由回调记录失败"""
+        if self._metrics_refresh_task is None or self._metrics_refresh_task.done():
+            self._metrics_refresh_task = asyncio.create_task(self._refresh_metrics())
+            if background:
+                self._metrics_refresh_task.add_done_callback(self._on_metrics_refreshed)
+        return self._metrics_refresh_task
+
+    async def _fetch_metrics(self) -> Dict[str, Any]:
+        """采集最新指标，并发的调用共享同一次采集"""
+        return await asyncio.shield(self._start_metrics_refresh())
+
+    async def _refresh_metrics(self) -> Dict[str, Any]:
+        """从Prometheus采集指标和告警并更新缓存"""
+        self._metrics_cache_stats["refreshes"] += 1
+        # 同步的HTTP请求放到线程中执行，避免阻塞事件循环
+        metrics = await asyncio.to_thread(self.prometheus_client.fetch_metrics)
+        alerts = self.prometheus_client.detect_alerts(metrics)
+
+        self._metrics_cache_time = time.time()
+        self._cached_metrics = {
+            "metrics": metrics,
+            "alerts": alerts,
+            "timestamp": self._metrics_cache_time
+        }
+        return self._cached_metrics
+
+    def _on_metrics_refreshed(self, task: asyncio.Task):
+        """后台采集结束回调，记录无人等待的采集失败；前台采集的失败由调用方处理"""
+        if not task.cancelled() and task.exception():
+            logger.warning(f"后台刷新指标失败: {task.exception()}")
+
+    def cache_metrics(self) -> Dict[str, Any]:
+        """返回指标缓存的命中统计"""
+        return {
+            **self._metrics_cache_stats,
+            "refresh_in_flight": self._metrics_refresh_task is not None and not self._metrics_refresh_task.done()
+        }
+
     def _generate_system_info_report(self, user_query: str, intent_analysis, metrics: List, alerts: List) -> str:
         """生成系统信息报告"""
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-        report = f"# 系统信息报告\n\n**生成时间**: {timestamp}\n\n"
+        # 报告各段先收集到列表中，最后一次拼接
+        parts = [f"# 系统信息报告\n\n**生成时间**: {timestamp}\n\n"]
 
         # 根据用户查询的参数提供特定信息
         if intent_analysis and intent_analysis.extracted_params:
             resource_type = intent_analysis.extracted_params.get("resource_type")
             if resource_type:
-                report += f"## {intent_analysis.extracted_params.get('resource_name', resource_type.upper())} 信息\n\n"
+                parts.append(f"## {intent_analysis.extracted_params.get('resource_name', resource_type.upper())} 信息\n\n")
                 # 添加特定资源的信息
                 # ... 这里可以根据resource_type提供详细信息
 
         # 添加总体系统状态
-        report += "## 系统状态概览\n\n"
-        report += f"- 监控指标数量: {len(metrics)}\n"
-        report += f"- 活跃告警数量: {len(alerts)}\n"
+        parts.append("## 系统状态概览\n\n")
+        parts.append(f"- 监控指标数量: {len(metrics)}\n")
+        parts.append(f"- 活跃告警数量: {len(alerts)}\n")
 
         if metrics:
-            report += "\n### 关键指标\n"
+            parts.append("\n### 关键指标\n")
             # 显示前几个关键指标
             for metric in metrics[:5]:
-                status_icon = "✅" if metric.status.value == 'normal' else "⚠️" if metric.status.value == 'warning' else "❌"
-                report += f"- {status_icon} **{metric.name}**: {metric.value}{metric.unit}\n"
+                status_icon = _STATUS_ICON.get(metric.status.value, "❌")
+                parts.append(f"- {status_icon} **{metric.name}**: {metric.value}{metric.unit}\n")
 
         if alerts:
-            report += "\n### 当前告警\n"
+            parts.append("\n### 当前告警\n")
             for alert in alerts[:3]:
-                level_icon = "🔴" if alert.level.value == 'critical' else "🟡"
-                report += f"- {level_icon} **{alert.metric_name}**: {alert.message}\n"
+                level_icon = _ALERT_LEVEL_ICON.get(alert.level.value, "🟡")
+                parts.append(f"- {level_icon} **{alert.metric_name}**: {alert.message}\n")
 
-        report += f"\n---\n*报告由智能运维助手自动生成*"
+        parts.append("\n---\n*报告由智能运维助手自动生成*")
 
-        return report
+        return "".join(parts)
 
-    def _analyze_problem_with_llm(self, user_query: str, intent_analysis, metrics: List, alerts: List) -> str:
+    async def _analyze_problem_with_llm(self, user_query: str, intent_analysis, metrics: List, alerts: List) -> str:
         """使用LLM分析问题"""
         # 构建分析提示
-        analysis_prompt = f"""
-请分析以下系统问题：
-
-用户描述: {user_query}
-提取的参数: {intent_analysis.extracted_params if intent_analysis else {}}
-
-当前系统状态:
-- 监控指标数量: {len(metrics)}
-- 活跃告警数量: {len(alerts)}
-
-请分析可能的问题原因并提供初步的诊断结果。
-"""
+        analysis_prompt = _ANALYSIS_PROMPT_TEMPLATE.format(
+            user_query=user_query,
+            extracted_params=intent_analysis.extracted_params if intent_analysis else {},
+            metrics_count=len(metrics),
+            alerts_count=len(alerts)
+        )
 
         # 调用LLM进行分析
-        from langchain_core.messages import HumanMessage, SystemMessage
-
         messages = [
-            SystemMessage(content="你是一个专业的系统故障诊断专家。"),
+            _ANALYSIS_SYSTEM_MESSAGE,
             HumanMessage(content=analysis_prompt)
         ]
 
-        response = self.system_analyzer.llm.invoke(messages)
+        response = await self._invoke_llm(messages)
         return response.content
 
-    def _generate_solution_response(self, user_query: str, problem_analysis: str) -> str:
+    async def _generate_solution_response(self, user_query: str, problem_analysis: str) -> str:
         """生成解决方案响应"""
-        solution_prompt = f"""
-基于以下问题分析，请提供详细的解决方案：
-
-用户问题: {user_query}
-问题分析: {problem_analysis}
-
-请提供：
-1. 问题的根本原因
-2. 具体的解决步骤
-3. 预防措施
-4. 如果需要，相关的命令示例
-"""
-
-        from langchain_core.messages import HumanMessage, SystemMessage
+        solution_prompt = _SOLUTION_PROMPT_TEMPLATE.format(user_query=user_query, problem_analysis=problem_analysis)
 
         messages = [
-            SystemMessage(content="你是一个专业的系统问题解决专家。"),
+            _SOLUTION_SYSTEM_MESSAGE,
             HumanMessage(content=solution_prompt)
         ]
 
-        response = self.system_analyzer.llm.invoke(messages)
+        response = await self._invoke_llm(messages)
         return response.content
 
     # ==================== 状态转换检查函数 ====================
@@ -590,7 +710,7 @@ class ReactOpsAssistantGraph:
 
         # 如果有严重问题，也执行
         urgency = analysis_result.get("urgency", "low")
-        if urgency in ["high", "critical"]:
+        if urgency in ("high", "critical"):
             return "execute"
 
         # 否则跳过执行，只报告
@@ -607,8 +727,10 @@ class ReactOpsAssistantGraph:
             metrics = state["metrics"]
             alerts = state["alerts"]
 
-            # 使用LLM进行智能分析
-            analysis_result = self.system_analyzer.analyze_metrics(metrics, alerts)
+            # 使用LLM进行智能分析，analyze_metrics内部是同步调用，放到线程中执行
+            async with _llm_semaphore:
+                await _llm_rate_limiter.acquire()
+                analysis_result = await asyncio.to_thread(self.system_analyzer.analyze_metrics, metrics, alerts)
 
             # 解析JSON格式的分析结果
             parsed_result = self.system_analyzer._parse_analysis_result(analysis_result["raw_analysis"])
@@ -645,7 +767,12 @@ class ReactOpsAssistantGraph:
             state["context"]["analysis_result"] = parsed_result
 
             logger.info(f"系统分析完成，检测到 {len(parsed_result.get('issues', []))} 个问题，{len(parsed_result.get('fix_plans', []))} 个修复计划")
-            return self.state_manager.get_state()
+            updates = self.state_manager.get_updates(
+                "analysis_result", "detected_issues", "analysis_data",
+                "fix_plans", "requires_approval", "action_history"
+            )
+            updates["context"] = state["context"]
+            return updates
 
         except Exception as e:
             logger.error(f"系统分析失败: {e}")
@@ -679,7 +806,7 @@ class ReactOpsAssistantGraph:
             })
 
             logger.info(f"生成执行计划，包含 {len(execution_plan)} 个操作")
-            return self.state_manager.get_state()
+            return self.state_manager.get_updates("execution_plan", "requires_approval", "action_history")
 
         except Exception as e:
             logger.error(f"生成执行计划失败: {e}")
@@ -698,30 +825,33 @@ class ReactOpsAssistantGraph:
                 logger.info("没有需要执行的操作")
                 return state
 
-            # 连接到远程服务器
-            with self.remote_executor as executor:
-                for i, command in enumerate(execution_plan):
-                    logger.info(f"执行操作 {i+1}/{len(execution_plan)}: {command}")
-
-                    # 执行命令
-                    result = executor.execute_command(command)
+            # 连接到远程服务器，执行结果先收集在本地，结束后一次写入状态
+            results = []
+            try:
+                with self.remote_executor as executor:
+                    for i, command in enumerate(execution_plan):
+                        logger.info(f"执行操作 {i+1}/{len(execution_plan)}: {command}")
 
-                    # 记录结果
-                    self.state_manager.add_execution_result(result)
+                        # 执行命令
+                        result = executor.execute_command(command)
+                        results.append(result)
 
-                    # 如果执行失败，记录错误但继续执行其他命令
-                    if not result.success:
-                        logger.warning(f"命令执行失败: {command}, 错误: {result.error}")
+                        # 如果执行失败，记录错误但继续执行其他命令
+                        if not result.success:
+                            logger.warning(f"命令执行失败: {command}, 错误: {result.error}")
+            finally:
+                # 中途出错时也保留已执行命令的结果
+                self.state_manager.add_execution_results(results)
 
             # 记录操作
             self.state_manager.add_action("execute_plan", {
                 "commands_executed": len(execution_plan),
-                "success_count": len([r for r in state["execution_results"] if r.success]),
+                "success_count": sum(1 for r in results if r.success),
                 "timestamp": datetime.now().isoformat()
             })
 
             logger.info(f"执行计划完成，共执行 {len(execution_plan)} 个操作")
-            return self.state_manager.get_state()
+            return self.state_manager.get_updates("execution_results", "action_history")
 
         except Exception as e:
             logger.error(f"执行计划失败: {e}")
@@ -765,12 +895,15 @@ class ReactOpsAssistantGraph:
         # 更新系统状态
         state["system_status"] = SystemStatus.CRITICAL
 
+        # 报告和操作记录共用同一时间
+        now = datetime.now()
+
         # 生成错误报告
         error_report = f"""
 ## 错误报告
 
 **错误信息**: {error_message}
-**时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+**时间**: {now.strftime('%Y-%m-%d %H:%M:%S')}
 
 **建议操作**:
 1. 检查系统连接状态
@@ -787,7 +920,7 @@ class ReactOpsAssistantGraph:
         # 记录错误操作
         self.state_manager.add_action("handle_errors", {
             "error_message": error_message,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now.isoformat()
         })
 
         return state
@@ -796,7 +929,8 @@ class ReactOpsAssistantGraph:
         """生成运维报告"""
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-        report = f"""
+        # 报告各段先收集到列表中，最后一次拼接
+        parts = [f"""
 # 智能运维助手报告
 
 **生成时间**: {timestamp}
@@ -808,66 +942,70 @@ class ReactOpsAssistantGraph:
 **活跃告警数量**: {len(state['alerts'])}
 
 ## 关键指标
-"""
+"""]
 
         # 添加关键指标信息
-        critical_metrics = [m for m in state['metrics'] if m.status.value in ['warning', 'critical']]
+        # 只显示前5个异常指标，找到5个即停止扫描
+        critical_metrics = list(itertools.islice(
+            (m for m in state['metrics'] if m.status.value in ('warning', 'critical')), 5
+        ))
         if critical_metrics:
-            report += "\n### 异常指标\n"
-            for metric in critical_metrics[:5]:  # 只显示前5个异常指标
-                status_icon = "❌" if metric.status.value == 'critical' else "⚠️"
-                report += f"- {status_icon} **{metric.name}**: {metric.value}{metric.unit}"
+            parts.append("\n### 异常指标\n")
+            for metric in critical_metrics:
+                status_icon = _STATUS_ICON.get(metric.status.value, "❌")
+                parts.append(f"- {status_icon} **{metric.name}**: {metric.value}{metric.unit}")
                 if metric.threshold:
-                    report += f" (阈值: {metric.threshold})"
-                report += "\n"
+                    parts.append(f" (阈值: {metric.threshold})")
+                parts.append("\n")
 
         # 添加告警信息
         if state['alerts']:
-            report += "\n## 活跃告警\n"
+            parts.append("\n## 活跃告警\n")
             for alert in state['alerts'][:3]:  # 只显示前3个告警
-                level_icon = "🔴" if alert.level.value == 'critical' else "🟡"
-                report += f"- {level_icon} **{alert.metric_name}**: {alert.message}\n"
-                report += f"  - 当前值: {alert.value}, 阈值: {alert.threshold}\n"
+                level_icon = _ALERT_LEVEL_ICON.get(alert.level.value, "🟡")
+                parts.append(f"- {level_icon} **{alert.metric_name}**: {alert.message}\n")
+                parts.append(f"  - 当前值: {alert.value}, 阈值: {alert.threshold}\n")
                 if alert.suggested_actions:
-                    report += f"  - 建议操作: {', '.join(alert.suggested_actions[:2])}\n"
+                    parts.append(f"  - 建议操作: {', '.join(alert.suggested_actions[:2])}\n")
 
         # 添加分析结果
         if state.get('analysis_result'):
-            report += "\n## 智能分析结果\n"
-            report += state['analysis_result'] + "\n"
+            parts.append("\n## 智能分析结果\n")
+            parts.append(state['analysis_result'])
+            parts.append("\n")
 
         # 添加执行计划
         if state['execution_plan']:
-            report += "\n## 自动执行计划\n"
+            parts.append("\n## 自动执行计划\n")
             for i, command in enumerate(state['execution_plan'], 1):
-                report += f"{i}. `{command}`\n"
+                parts.append(f"{i}. `{command}`\n")
 
         # 添加执行结果
         if state['execution_results']:
-            report += "\n## 执行结果\n"
-            success_count = len([r for r in state['execution_results'] if r.success])
-            report += f"成功执行: {success_count}/{len(state['execution_results'])} 个操作\n"
+            parts.append("\n## 执行结果\n")
+            success_count = sum(1 for r in state['execution_results'] if r.success)
+            parts.append(f"成功执行: {success_count}/{len(state['execution_results'])} 个操作\n")
 
             # 显示最近的成功和失败操作
             for result in state['execution_results'][-3:]:  # 显示最后3个结果
                 status_icon = "✅" if result.success else "❌"
-                report += f"- {status_icon} `{result.command}`\n"
+                parts.append(f"- {status_icon} `{result.command}`\n")
                 if result.error:
-                    report += f"  错误: {result.error}\n"
+                    parts.append(f"  错误: {result.error}\n")
 
         # 添加错误信息
         if state.get('error_message'):
-            report += f"\n## ⚠️ 错误信息\n{state['error_message']}\n"
+            parts.append(f"\n## ⚠️ 错误信息\n{state['error_message']}\n")
 
-        report += f"\n---\n*报告由智能运维助手自动生成*"
+        parts.append("\n---\n*报告由智能运维助手自动生成*")
 
-        return report
+        return "".join(parts)
 
     # ==================== 主要运行接口 ====================
 
     async def run(self, user_query: str = None) -> Dict[str, Any]:
         """运行React智能运维助手"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         session_id = self.state_manager.state.get("session_id", f"react_session_{int(time.time())}")
 
         try:
@@ -889,11 +1027,11 @@ class ReactOpsAssistantGraph:
             if user_query:
                 self.state_manager.state["user_query"] = user_query
 
-            # 创建初始状态
+            # 创建初始状态，LangGraph不会修改输入，最终状态会合并回状态管理器
             initial_state = self.state_manager.get_state()
 
             # 首先分析意图
-            intent_analysis = conversation_router.analyze_intent(user_query or "")
+            intent_analysis = conversation_router.analyze_intent_cached(user_query or "")
 
             # 根据意图选择工作流
             if intent_analysis.intent_type == IntentType.SYSTEM_CHECK:
@@ -939,7 +1077,7 @@ class ReactOpsAssistantGraph:
                     }
                 )
 
-            end_time = time.time()
+            end_time = time.perf_counter()
             processing_time = end_time - start_time
 
             logger.info(f"React智能运维助手运行完成 (耗时: {processing_time:.2f}s)")
@@ -977,11 +1115,11 @@ class ReactOpsAssistantGraph:
             return {
                 "success": False,
                 "error": str(e),
-                "state": self.state_manager.get_state(),
+                "state": self.state_manager.snapshot(),
                 "response": f"React智能运维助手运行失败: {str(e)}",
                 "session_id": session_id
             }
 
     def get_current_state(self) -> OpsAssistantState:
-        """获取当前状态"""
+        """获取当前状态（只读）"""
         return self.state_manager.get_state()
\ No newline at end of file
@@ -1,3 +1,5 @@
+import copy
+import uuid
 from typing import Dict, List, Optional, Any, TypedDict
 from datetime import datetime
 from dataclasses import dataclass
@@ -16,7 +18,7 @@ class SystemStatus(Enum):
     CRITICAL = "critical"
     UNKNOWN = "unknown"
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class MetricValue:
     """监控指标值"""
     name: str
@@ -26,7 +28,7 @@ class MetricValue:
     threshold: Optional[float] = None
     status: AlertLevel = AlertLevel.NORMAL
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SystemAlert:
     """系统告警"""
     metric_name: str
@@ -37,7 +39,7 @@ class SystemAlert:
     timestamp: datetime
     suggested_actions: List[str]
 
-@dataclass
+@dataclass(slots=True)
 class ExecutionResult:
     """命令执行结果"""
     command: str
@@ -126,7 +128,6 @@ class StateManager:
 
     def _generate_session_id(self) -> str:
         """生成会话ID"""
-        import uuid
         return str(uuid.uuid4())
 
     def update_metrics(self, metrics: List[MetricValue]):
@@ -144,6 +145,19 @@ class StateManager:
         elif alert.level == AlertLevel.WARNING and self.state["system_status"] == SystemStatus.HEALTHY:
             self.state["system_status"] = SystemStatus.WARNING
 
+    def add_alerts(self, alerts: List[SystemAlert]):
+        """批量添加告警，系统状态只更新一次"""
+        if not alerts:
+            return
+        self.state["alerts"].extend(alerts)
+
+        # 更新系统状态，结果与逐条调用add_alert一致
+        levels = {alert.level for alert in alerts}
+        if AlertLevel.CRITICAL in levels:
+            self.state["system_status"] = SystemStatus.CRITICAL
+        elif AlertLevel.WARNING in levels and self.state["system_status"] == SystemStatus.HEALTHY:
+            self.state["system_status"] = SystemStatus.WARNING
+
     def update_analysis(self, result: str, issues: List[str], analysis_data: Dict[str, Any] = None):
         """更新分析结果"""
         self.state["analysis_result"] = result
@@ -170,10 +184,12 @@ class StateManager:
 
     def start_execution(self):
         """开始执行修复计划"""
-        self.state["execution_in_progress"] = True
-        self.state["current_execution_step"] = 0
-        self.state["execution_phase"] = "executing"
-        self.state["execution_results"] = []
+        self.state.update({
+            "execution_in_progress": True,
+            "current_execution_step": 0,
+            "execution_phase": "executing",
+            "execution_results": []
+        })
 
     def set_execution_step(self, step: int):
         """设置当前执行步骤"""
@@ -183,30 +199,27 @@ class StateManager:
         """添加执行结果"""
         self.state["execution_results"].append(result)
 
+    def add_execution_results(self, results: List[ExecutionResult]):
+        """批量添加执行结果"""
+        self.state["execution_results"].extend(results)
+
     def complete_execution(self):
         """完成执行"""
-        self.state["execution_in_progress"] = False
-        self.state["execution_phase"] = "completed"
+        self.state.update({"execution_in_progress": False, "execution_phase": "completed"})
 
     def fail_execution(self):
         """执行失败"""
-        self.state["execution_in_progress"] = False
-        self.state["execution_phase"] = "failed"
+        self.state.update({"execution_in_progress": False, "execution_phase": "failed"})
 
     def rollback_execution(self):
         """回滚执行"""
-        self.state["execution_in_progress"] = False
-        self.state["execution_phase"] = "rolled_back"
+        self.state.update({"execution_in_progress": False, "execution_phase": "rolled_back"})
 
     def set_execution_plan(self, plan: List[str]):
         """设置执行计划"""
         self.state["execution_plan"] = plan
         self.state["requires_approval"] = len(plan) > 0
 
-    def add_execution_result(self, result: ExecutionResult):
-        """添加执行结果"""
-        self.state["execution_results"].append(result)
-
     def add_conversation(self, user_msg: str, ai_msg: str):
         """添加对话记录"""
         self.state["conversation_history"].append({
@@ -243,15 +256,24 @@ class StateManager:
             "system_status": SystemStatus.UNKNOWN
         })
 
-    def get_state(self) -> OpsAssistantState:
-        """获取当前状态"""
-        return self.state.copy()
+    def get_state(self, readonly: bool = True) -> OpsAssistantState:
+        """获取当前状态；默认直接返回内部状态字典，调用方不得修改，需要修改时传readonly=False获取副本"""
+        return self.state if readonly else self.snapshot()
+
+    def snapshot(self) -> OpsAssistantState:
+        """获取当前状态的浅拷贝"""
+        return copy.copy(self.state)
+
+    def get_updates(self, *keys: str) -> Dict[str, Any]:
+        """获取指定字段的当前值，作为工作流节点返回的局部状态更新"""
+        return {key: self.state[key] for key in keys}
 
     def get_summary(self) -> str:
         """获取状态摘要"""
         metrics_count = len(self.state["metrics"])
-        alerts_count = len(self.state["alerts"])
-        critical_alerts = len([a for a in self.state["alerts"] if a.level == AlertLevel.CRITICAL])
+        alerts = self.state["alerts"]
+        alerts_count = len(alerts)
+        critical_alerts = sum(1 for a in alerts if a.level is AlertLevel.CRITICAL)
 
         summary = f"系统状态: {self.state['system_status'].value}\n"
         summary += f"监控指标: {metrics_count}个\n"
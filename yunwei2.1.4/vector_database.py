@@ -5,17 +5,23 @@
 """
 
 import os
+import functools
 import logging
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Set, Tuple, Union
 from pathlib import Path
 import json
 import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import re
+import threading
+import time
+import uuid
 
+import httpx
 import chromadb
 from chromadb.config import Settings
-import tiktoken
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import (
     TextLoader,
@@ -32,38 +38,60 @@ from fixed_embeddings import ChromaDefaultEmbeddings
 
 logger = get_logger(__name__)
 
+# DashScope嵌入接口单次请求的最大文本数（text-embedding-v4上限为10条）
+DASHSCOPE_EMBED_BATCH_SIZE = 10
+# 并发发送嵌入请求的最大线程数
+DASHSCOPE_EMBED_CONCURRENCY = 8
+# 初始化知识库时同时导入的最大文件数
+KNOWLEDGE_BASE_INGEST_CONCURRENCY = 8
+# 初始化知识库时导入的文件扩展名
+SUPPORTED_EXTENSIONS = frozenset(('.pdf', '.txt', '.md', '.csv', '.docx', '.doc', '.xlsx', '.xls'))
+# 相似性检索结果缓存的最大条目数，知识库内容变化时清空
+SEARCH_CACHE_SIZE = 256
+# 批量导入时写入缓冲区的文档片段数阈值，以及缓冲数据最长等待时间（秒），达到任一条件即合并写入
+CHROMA_FLUSH_THRESHOLD = 512
+CHROMA_FLUSH_INTERVAL = 5
+
 
 class DashScopeEmbeddings(Embeddings):
     """阿里云DashScope文本嵌入模型"""
 
-    def __init__(self, model_name: str = "text-embedding-v4"):
+    def __init__(self, model_name: str = "text-embedding-v4",
+                 batch_size: int = DASHSCOPE_EMBED_BATCH_SIZE,
+                 max_concurrency: int = DASHSCOPE_EMBED_CONCURRENCY):
         self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
         self.api_key = os.getenv("DASHSCOPE_API_KEY")
         self.base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
 
         if not self.api_key:
             raise ValueError("DASHSCOPE_API_KEY environment variable is not set")
 
-    def _get_embedding(self, texts: List[str]) -> List[List[float]]:
-        """获取文本嵌入向量"""
-        import requests
-
-        headers = {
+        self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        # 异步客户端在首次使用时创建，之后复用连接池
+        self._client: Optional[httpx.AsyncClient] = None
 
-        data = {
+    def _request_data(self, texts: List[str]) -> Dict[str, Any]:
+        """构造嵌入请求体"""
+        return {
             "model": self.model_name,
             "input": texts,
             "encoding_format": "float"
         }
 
+    def _get_embedding(self, texts: List[str]) -> List[List[float]]:
+        """获取文本嵌入向量"""
+        import requests
+
         try:
             response = requests.post(
                 f"{self.base_url}/embeddings",
-                headers=headers,
-                json=data,
+                headers=self.headers,
+                json=self._request_data(texts),
                 timeout=60
             )
             response.raise_for_status()
@@ -77,14 +105,65 @@ class DashScopeEmbeddings(Embeddings):
             raise
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """嵌入文档文本"""
-        return self._get_embedding(texts)
+        """嵌入文档文本，按批拆分后并发请求，结果保持输入顺序"""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1:
+            return self._get_embedding(texts)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+            return list(itertools.chain.from_iterable(executor.map(self._get_embedding, batches)))
 
     def embed_query(self, text: str) -> List[float]:
         """嵌入查询文本"""
         embeddings = self._get_embedding([text])
         return embeddings[0]
 
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """共享的异步HTTP客户端"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.base_url, headers=self.headers, timeout=60)
+        return self._client
+
+    async def _aget_embedding(self, texts: List[str]) -> List[List[float]]:
+        """异步获取文本嵌入向量"""
+        try:
+            response = await self.client.post("/embeddings", json=self._request_data(texts))
+            response.raise_for_status()
+
+            result = response.json()
+            return [item["embedding"] for item in result["data"]]
+
+        except Exception as e:
+            logger.error(f"获取嵌入向量失败: {e}")
+            raise
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """异步嵌入文档文本，按批拆分后限制并发数同时请求，结果保持输入顺序"""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1:
+            return await self._aget_embedding(texts)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _bounded(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self._aget_embedding(batch)
+
+        results = await asyncio.gather(*(_bounded(batch) for batch in batches))
+        return list(itertools.chain.from_iterable(results))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """异步嵌入查询文本"""
+        embeddings = await self._aget_embedding([text])
+        return embeddings[0]
+
+    async def aclose(self):
+        """关闭异步HTTP客户端"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
 
 class DocumentProcessor:
     """文档处理器"""
@@ -95,11 +174,6 @@ class DocumentProcessor:
             chunk_overlap=200,
             separators=["\n\n", "\n", " ", ""]
         )
-        self.encoding = tiktoken.get_encoding("cl100k_base")
-
-    def _token_count(self, text: str) -> int:
-        """计算文本的token数量"""
-        return len(self.encoding.encode(text))
 
     def load_document(self, file_path: str) -> List[Document]:
         """根据文件类型加载文档"""
@@ -169,6 +243,18 @@ class VectorDatabase:
         # 文档处理器
         self.document_processor = DocumentProcessor()
 
+        # 相同的(query, k)直接复用检索结果
+        self._cached_search = functools.lru_cache(maxsize=SEARCH_CACHE_SIZE)(self._search)
+
+        # 批量导入时待写入的文档片段，按来源文件分组，组内键名与collection.add的参数一致
+        self._pending: List[Tuple[str, Dict[str, list]]] = []
+        self._pending_count = 0
+        self._pending_since: Optional[float] = None
+        # 缓冲写入失败的来源文件，由pop_failed_writes取出
+        self._failed_writes: Set[str] = set()
+        self._pending_lock = threading.Lock()
+        self._flush_threshold = CHROMA_FLUSH_THRESHOLD
+
         # 获取或创建集合
         self._ensure_collection()
 
@@ -186,8 +272,14 @@ class VectorDatabase:
             logger.error(f"创建或获取集合失败: {e}")
             return False
 
-    def add_documents(self, documents: List[Document], source: str = None) -> bool:
-        """添加文档到向量数据库"""
+    @staticmethod
+    def _empty_pending() -> Dict[str, list]:
+        """空的写入缓冲区"""
+        return {"ids": [], "documents": [], "metadatas": []}
+
+    def add_documents(self, documents: List[Document], source: str = None, buffered: bool = False,
+                      buffer_key: str = None) -> bool:
+        """添加文档到向量数据库；buffered为True时按buffer_key（默认为source）分组放入写入缓冲区，由flush合并写入"""
         try:
             if not documents:
                 return False
@@ -197,23 +289,30 @@ class VectorDatabase:
                 logger.error("无法创建或获取集合，添加文档失败")
                 return False
 
-            # 准备文档数据
+            # 准备文档数据，同一批文档共用一个时间戳；并发导入同名文件时靠随机后缀区分ID
+            now = datetime.now()
+            id_suffix = f"{now.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+            added_at = now.isoformat()
+
             ids = []
             texts = []
             metadatas = []
 
             for i, doc in enumerate(documents):
-                doc_id = f"{source}_{i}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                ids.append(doc_id)
+                ids.append(f"{source}_{i}_{id_suffix}")
                 texts.append(doc.page_content)
 
                 # 准备元数据
                 metadata = doc.metadata.copy()
                 if source:
                     metadata["source"] = source
-                metadata["added_at"] = datetime.now().isoformat()
+                metadata["added_at"] = added_at
                 metadatas.append(metadata)
 
+            if buffered:
+                self._buffer_documents(buffer_key or source, ids, texts, metadatas)
+                return True
+
             # 批量添加到向量数据库
             self.collection.add(
                 ids=ids,
@@ -221,6 +320,7 @@ class VectorDatabase:
                 metadatas=metadatas
             )
 
+            self._cached_search.cache_clear()
             logger.info(f"成功添加 {len(documents)} 个文档片段到向量数据库")
             return True
 
@@ -228,7 +328,65 @@ class VectorDatabase:
             logger.error(f"添加文档到向量数据库失败: {e}")
             return False
 
-    def load_and_add_file(self, file_path: str) -> bool:
+    def _buffer_documents(self, key: str, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]):
+        """把一个来源的文档片段放入写入缓冲区，达到数量或时间阈值时合并写入"""
+        with self._pending_lock:
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            self._pending.append((key, {"ids": ids, "documents": texts, "metadatas": metadatas}))
+            self._pending_count += len(ids)
+            due = (self._pending_count >= self._flush_threshold
+                   or time.monotonic() - self._pending_since >= CHROMA_FLUSH_INTERVAL)
+
+        logger.info(f"已缓冲 {len(ids)} 个文档片段，等待批量写入")
+        if due:
+            self.flush()
+
+    def flush(self) -> bool:
+        """把写入缓冲区中的文档片段一次性写入向量数据库；合并写入失败时逐个来源重试，全部写入成功才返回True"""
+        with self._pending_lock:
+            groups = self._pending
+            if not groups:
+                return True
+            self._pending = []
+            self._pending_count = 0
+            self._pending_since = None
+
+        batch = self._empty_pending()
+        for _, group in groups:
+            for name, values in group.items():
+                batch[name].extend(values)
+
+        try:
+            self.collection.add(**batch)
+        except Exception as e:
+            logger.warning(f"批量写入 {len(batch['ids'])} 个文档片段失败，逐个文件重试: {e}")
+            failed = []
+            for key, group in groups:
+                try:
+                    self.collection.add(**group)
+                except Exception as e:
+                    logger.error(f"写入 {key} 的 {len(group['ids'])} 个文档片段失败: {e}")
+                    failed.append(key)
+
+            self._cached_search.cache_clear()
+            if failed:
+                with self._pending_lock:
+                    self._failed_writes.update(failed)
+                return False
+            return True
+
+        self._cached_search.cache_clear()
+        logger.info(f"成功批量写入 {len(batch['ids'])} 个文档片段到向量数据库")
+        return True
+
+    def pop_failed_writes(self) -> Set[str]:
+        """取出并清空缓冲写入失败的来源文件"""
+        with self._pending_lock:
+            failed, self._failed_writes = self._failed_writes, set()
+        return failed
+
+    def load_and_add_file(self, file_path: str, buffered: bool = False) -> bool:
         """加载文件并添加到向量数据库"""
         try:
             # 加载文档
@@ -239,7 +397,7 @@ class VectorDatabase:
 
             # 添加到向量数据库
             source = Path(file_path).stem
-            return self.add_documents(split_docs, source)
+            return self.add_documents(split_docs, source, buffered=buffered, buffer_key=file_path)
 
         except Exception as e:
             logger.error(f"加载文件失败 {file_path}: {e}")
@@ -253,27 +411,7 @@ class VectorDatabase:
                 logger.error("集合不存在，无法进行搜索")
                 return []
 
-            # 嵌入查询
-            query_embedding = self.embeddings.embed_query(query)
-
-            # 执行搜索
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=k,
-                include=["documents", "metadatas", "distances"]
-            )
-
-            # 格式化结果
-            search_results = []
-            if results["documents"] and results["documents"][0]:
-                for i, doc in enumerate(results["documents"][0]):
-                    search_results.append({
-                        "content": doc,
-                        "metadata": results["metadatas"][0][i] if results["metadatas"] and results["metadatas"][0] else {},
-                        "distance": results["distances"][0][i] if results["distances"] and results["distances"][0] else 0.0,
-                        "relevance_score": 1 - results["distances"][0][i] if results["distances"] and results["distances"][0] else 1.0
-                    })
-
+            search_results = [dict(result) for result in self._cached_search(query, k)]
             logger.info(f"检索到 {len(search_results)} 个相关文档片段")
             return search_results
 
@@ -281,6 +419,31 @@ class VectorDatabase:
             logger.error(f"相似性搜索失败: {e}")
             return []
 
+    def _search(self, query: str, k: int) -> tuple:
+        """嵌入查询并检索集合，结果以元组形式缓存；出错时抛出异常，不缓存失败结果"""
+        # 嵌入查询
+        query_embedding = self.embeddings.embed_query(query)
+
+        # 执行搜索
+        results = self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            include=["documents", "metadatas", "distances"]
+        )
+
+        # 格式化结果
+        search_results = []
+        if results["documents"] and results["documents"][0]:
+            for i, doc in enumerate(results["documents"][0]):
+                search_results.append({
+                    "content": doc,
+                    "metadata": results["metadatas"][0][i] if results["metadatas"] and results["metadatas"][0] else {},
+                    "distance": results["distances"][0][i] if results["distances"] and results["distances"][0] else 0.0,
+                    "relevance_score": 1 - results["distances"][0][i] if results["distances"] and results["distances"][0] else 1.0
+                })
+
+        return tuple(search_results)
+
     def search_with_context(self, query: str, k: int = 5) -> Dict[str, Any]:
         """带上下文的搜索"""
         try:
@@ -358,6 +521,11 @@ class VectorDatabase:
         """重置数据库"""
         try:
             self.client.reset()
+            with self._pending_lock:
+                self._pending = []
+                self._pending_count = 0
+                self._pending_since = None
+            self._cached_search.cache_clear()
             logger.info("向量数据库已重置")
             return True
         except Exception as e:
@@ -365,6 +533,21 @@ class VectorDatabase:
             return False
 
 
+def _iter_supported_files(root: str):
+    """递归遍历目录，按扩展名筛选出可导入的文件路径"""
+    try:
+        entries = list(os.scandir(root))
+    except OSError as e:
+        logger.warning(f"无法读取目录 {root}: {e}")
+        return
+
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from _iter_supported_files(entry.path)
+        elif os.path.splitext(entry.name)[1].lower() in SUPPORTED_EXTENSIONS and entry.is_file():
+            yield entry.path
+
+
 # 全局向量数据库实例
 vector_db = None
 
@@ -383,18 +566,28 @@ async def initialize_knowledge_base(document_folder: str = None) -> bool:
         db = get_vector_database()
 
         if document_folder and Path(document_folder).exists():
-            # 扫描文件夹中的文档
-            doc_path = Path(document_folder)
-            supported_extensions = {'.pdf', '.txt', '.md', '.csv', '.docx', '.doc', '.xlsx', '.xls'}
+            # 在线程中扫描文件夹中的文档，避免大目录阻塞事件循环
+            files = await asyncio.to_thread(list, _iter_supported_files(document_folder))
+
+            # 文件加载、切分和写入都是阻塞操作，放到线程中并限制同时导入的文件数
+            semaphore = asyncio.Semaphore(KNOWLEDGE_BASE_INGEST_CONCURRENCY)
 
-            file_count = 0
-            for file_path in doc_path.rglob('*'):
-                if file_path.is_file() and file_path.suffix.lower() in supported_extensions:
-                    success = db.load_and_add_file(str(file_path))
-                    if success:
-                        file_count += 1
+            async def _ingest(file_path: str) -> bool:
+                async with semaphore:
+                    return await asyncio.to_thread(db.load_and_add_file, file_path, True)
+
+            results = await asyncio.gather(*(_ingest(file_path) for file_path in files), return_exceptions=True)
+
+            # 写入缓冲区中剩余的文档片段，文档片段实际写入后才计为加载成功
+            flushed = await asyncio.to_thread(db.flush)
+            failed_writes = db.pop_failed_writes()
+            file_count = sum(1 for file_path, result in zip(files, results)
+                             if result is True and file_path not in failed_writes)
 
             logger.info(f"知识库初始化完成，共加载 {file_count} 个文件")
+            if not flushed or failed_writes:
+                logger.error(f"{len(failed_writes)} 个文件的文档片段写入向量数据库失败")
+                return False
 
         stats = db.get_collection_stats()
         logger.info(f"向量数据库统计: {stats}")
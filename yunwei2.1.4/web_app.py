@@ -9,6 +9,7 @@ import json
 import logging
 import os
 from datetime import datetime
+from dataclasses import fields, is_dataclass
 from typing import Dict, List, Any, Optional
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request
 from fastapi.staticfiles import StaticFiles
@@ -63,6 +64,9 @@ def serialize_datetime(obj):
         return {key: serialize_datetime(value) for key, value in obj.items()}
     elif isinstance(obj, list):
         return [serialize_datetime(item) for item in obj]
+    elif is_dataclass(obj):
+        # 指标、告警等状态数据类使用__slots__，没有__dict__
+        return {field.name: serialize_datetime(getattr(obj, field.name)) for field in fields(obj)}
     elif hasattr(obj, '__dict__'):
         # 处理自定义对象
         return {key: serialize_datetime(value) for key, value in obj.__dict__.items() if not key.startswith('_')}
@@ -234,11 +238,11 @@ async def get_metrics():
         metrics = prometheus.fetch_metrics()
 
         # 按类型分组并序列化
-        cpu_metrics = [serialize_datetime(m.__dict__) for m in metrics if 'cpu' in m.name.lower()]
-        memory_metrics = [serialize_datetime(m.__dict__) for m in metrics if 'memory' in m.name.lower()]
-        disk_metrics = [serialize_datetime(m.__dict__) for m in metrics if 'disk' in m.name.lower()]
-        network_metrics = [serialize_datetime(m.__dict__) for m in metrics if 'network' in m.name.lower() or 'tcp' in m.name.lower()]
-        system_metrics = [serialize_datetime(m.__dict__) for m in metrics if 'load' in m.name.lower()]
+        cpu_metrics = [serialize_datetime(m) for m in metrics if 'cpu' in m.name.lower()]
+        memory_metrics = [serialize_datetime(m) for m in metrics if 'memory' in m.name.lower()]
+        disk_metrics = [serialize_datetime(m) for m in metrics if 'disk' in m.name.lower()]
+        network_metrics = [serialize_datetime(m) for m in metrics if 'network' in m.name.lower() or 'tcp' in m.name.lower()]
+        system_metrics = [serialize_datetime(m) for m in metrics if 'load' in m.name.lower()]
 
         return MetricsResponse(
             cpu_metrics=cpu_metrics,
@@ -263,7 +267,7 @@ async def get_alerts():
         warning_count = len([a for a in alerts if a.level.value == 'warning'])
 
         return AlertResponse(
-            alerts=[serialize_datetime(alert.__dict__) for alert in alerts],
+            alerts=[serialize_datetime(alert) for alert in alerts],
             count=len(alerts),
             critical_count=critical_count,
             warning_count=warning_count